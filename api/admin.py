@@ -1,7 +1,78 @@
-from django.contrib import admin
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin.helpers import ActionForm
 from django.contrib.auth.admin import UserAdmin as UA
-from .models import *
+from django.core.exceptions import PermissionDenied
+from django.core.paginator import Paginator
+from django.db import connections
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
+from django.utils.functional import cached_property
+from .models import (
+    Cart, CartItem, Category, Delivery, Notification, Order, OrderItem, Product, SellerInventory,
+    SellerProfile, User,
+)
 from .forms import CustomUserCreationForm, CustomUserChangeForm
+from .inventory import adjust_stock, set_availability
+from .profiling import list_profiles, profile_path, summarize
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that never runs COUNT(*) over a whole table. Unfiltered changelists on
+    PostgreSQL use the planner's row estimate, everything else is counted up to
+    ADMIN_COUNT_LIMIT rows (narrow it down with search or filters to see past that).
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if not queryset.query.where and connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT reltuples FROM pg_class WHERE relname = %s', [queryset.model._meta.db_table])
+                row = cursor.fetchone()
+            # -1 until the table has been analyzed
+            if row and row[0] > settings.ADMIN_COUNT_LIMIT:
+                return int(row[0])
+        return queryset[:settings.ADMIN_COUNT_LIMIT].count()
+
+
+class InputFilter(admin.FieldListFilter):
+    """Sidebar filter with a text box (exact match) instead of a link for every distinct value"""
+    template = 'admin/input_filter.html'
+
+    def __init__(self, field, request, params, model, model_admin, field_path):
+        self.lookup_kwarg = field_path
+        super().__init__(field, request, params, model, model_admin, field_path)
+        self.title = field_path.split('__')[0].replace('_', ' ')
+
+    def expected_parameters(self):
+        return [self.lookup_kwarg]
+
+    def value(self):
+        value = self.used_parameters.get(self.lookup_kwarg)
+        return value[-1] if isinstance(value, list) else value
+
+    def choices(self, changelist):
+        # The other filters, search and ordering go along with the form as hidden fields
+        yield {
+            'value': self.value() or '',
+            'hidden': [
+                (name, value) for name, value in changelist.params.items()
+                if name != self.lookup_kwarg
+            ],
+            'query_string': changelist.get_query_string(remove=[self.lookup_kwarg]),
+        }
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    """Changelist settings that keep their cost flat as the table grows"""
+    paginator = EstimatedCountPaginator
+    # No second COUNT(*) for the "x of y selected" total when filtering
+    show_full_result_count = False
+    list_per_page = 15
 # Register your models here.
 # Text changes in admin page
 admin.site.site_header = "Kinmel Admin"
@@ -29,6 +100,8 @@ class UserAdmin(UA):
     search_fields = ('email', 'username')
     ordering = ('username',)
     list_per_page = 15
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
 
 
 admin.site.register(User, UserAdmin)
@@ -36,59 +109,101 @@ admin.site.register(User, UserAdmin)
 class SellerInventoryInline(admin.TabularInline):
     model = SellerInventory
     extra = 1
+    # Search widgets instead of dropdowns listing every user and product
+    autocomplete_fields = ('seller', 'product')
 
-class SellerProfileAdmin(admin.ModelAdmin):
-    search_fields = ('user__username', 'company_name', 'verified')
+class SellerProfileAdmin(LargeTableAdmin):
+    search_fields = ('user__username', 'company_name')
     list_display = ('user', 'company_name', 'verified')
-    list_filter = ('user__username', 'verified')
+    list_filter = (('user__username', InputFilter), 'verified')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     inlines = [SellerInventoryInline]
-    list_per_page = 15
     list_editable = ('verified',)
 
 admin.site.register(SellerProfile, SellerProfileAdmin)
 
-class CategoryAdmin(admin.ModelAdmin):
+class CategoryAdmin(LargeTableAdmin):
     search_fields = ('name',)
     list_display = ('name',)
-    list_filter = ('name',)
-    list_per_page = 15
+    list_filter = (('name', InputFilter),)
 
 admin.site.register(Category, CategoryAdmin)
 
-class ProductAdmin(admin.ModelAdmin):
-    search_fields = ('name', 'price', 'seller__username')
+class StockActionForm(ActionForm):
+    # Used by the stock actions, shown next to the action dropdown
+    quantity = forms.IntegerField(min_value=0, required=False)
+
+def stock_action(operation, description):
+    @admin.action(description=description)
+    def action(modeladmin, request, queryset):
+        quantity = request.POST.get('quantity', '')
+        if not quantity.isdigit():
+            modeladmin.message_user(request, "Enter a quantity for the stock action", messages.ERROR)
+            return
+        updated = adjust_stock(queryset, operation, int(quantity))
+        modeladmin.message_user(request, f"Stock updated for {updated} inventory rows")
+    action.__name__ = f'{operation}_stock'
+    return action
+
+@admin.action(description="Put selected products on sale")
+def make_available(modeladmin, request, queryset):
+    updated = set_availability(queryset, True)
+    modeladmin.message_user(request, f"{updated} products are back on sale, those in stock are available now")
+
+@admin.action(description="Take selected products off sale")
+def make_unavailable(modeladmin, request, queryset):
+    updated = set_availability(queryset, False)
+    modeladmin.message_user(request, f"{updated} products are now unavailable")
+
+class ProductAdmin(LargeTableAdmin):
+    search_fields = ('name', 'product_code', 'seller__username')
     list_display = ('name','price', 'seller__username')
-    list_filter = ('name','price', 'seller__username')
-    list_per_page = 15
+    list_filter = (('name', InputFilter), ('seller__username', InputFilter), 'is_available', 'listed')
+    list_select_related = ('seller',)
+    autocomplete_fields = ('category', 'seller')
+    actions = [make_available, make_unavailable]
 
 admin.site.register(Product, ProductAdmin)
 
-class SellerInventoryAdmin(admin.ModelAdmin):
+class SellerInventoryAdmin(LargeTableAdmin):
     search_fields = ('seller__username', 'product__name')
     list_display = ('seller__username', 'product__name', 'stock_quantity')
-    list_filter = ('seller__username', 'product__name')
-    list_per_page = 15
+    list_filter = (('seller__username', InputFilter), ('product__name', InputFilter))
+    list_select_related = ('seller', 'product')
+    autocomplete_fields = ('seller', 'product')
+    raw_id_fields = ('profile',)
+    action_form = StockActionForm
+    actions = [
+        stock_action('set', "Set stock of selected rows to quantity"),
+        stock_action('add', "Add quantity to stock of selected rows"),
+        stock_action('subtract', "Subtract quantity from stock of selected rows"),
+    ]
 
 admin.site.register(SellerInventory, SellerInventoryAdmin)
 
 class CartItemInline(admin.TabularInline):
     model = CartItem
     extra = 1 # blank forms to show
+    autocomplete_fields = ('product',)
 
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin):
     search_fields = ('user__username', 'user__phone')
     list_display = ('user', 'user__phone', 'total_price')
-    list_filter = ('user__username',)
-    list_per_page = 15
+    list_filter = (('user__username', InputFilter),)
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
     inlines = [CartItemInline]
 
 admin.site.register(Cart, CartAdmin)
 
-class CartItemAdmin(admin.ModelAdmin):
+class CartItemAdmin(LargeTableAdmin):
     search_fields = ('cart__user__username', 'product__name')
     list_display = ('cart', 'product__name')
-    list_filter = ('cart__user__username', 'product__name')
-    list_per_page = 15
+    list_filter = (('cart__user__username', InputFilter), ('product__name', InputFilter))
+    list_select_related = ('cart', 'product')
+    raw_id_fields = ('cart',)
+    autocomplete_fields = ('product',)
 
 admin.site.register(CartItem, CartItemAdmin)
 
@@ -96,36 +211,66 @@ admin.site.register(CartItem, CartItemAdmin)
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 1 # blank forms to show
+    autocomplete_fields = ('product',)
 
-class OrderAdmin(admin.ModelAdmin):
-    search_fields = ('customer__username', 'status')
+class OrderAdmin(LargeTableAdmin):
+    search_fields = ('customer__username', '=order_code')
     list_display = ('customer__username', 'status')
-    list_filter = ('customer__username', 'status')
-    list_per_page = 15
+    list_filter = (('customer__username', InputFilter), 'status')
+    list_select_related = ('customer',)
+    autocomplete_fields = ('customer',)
     inlines = [OrderItemInline]
 
 admin.site.register(Order, OrderAdmin)
 
-class OrderItemAdmin(admin.ModelAdmin):
-    search_fields = ('order', 'product__name')
+class OrderItemAdmin(LargeTableAdmin):
+    search_fields = ('=order__id', 'product__name')
     list_display = ('order__customer__username', 'product__name')
-    list_filter = ('order__customer__username', 'product__name')
-    list_per_page = 15
+    list_filter = (('order__customer__username', InputFilter), ('product__name', InputFilter))
+    list_select_related = ('order__customer', 'product')
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('product',)
 
 admin.site.register(OrderItem, OrderItemAdmin)
 
-class DeliveryAdmin(admin.ModelAdmin):
-    search_fields = ('order__customer__username', 'delivery_person', 'status')
+class DeliveryAdmin(LargeTableAdmin):
+    search_fields = ('order__customer__username', 'delivery_person__username')
     list_display = ('order__customer__username', 'delivery_person', 'status')
-    list_filter = ('order__customer__username', 'delivery_person', 'status')
-    list_per_page = 15
+    list_filter = (('order__customer__username', InputFilter), ('delivery_person__username', InputFilter), 'status')
+    list_select_related = ('order__customer', 'delivery_person')
+    raw_id_fields = ('order',)
+    autocomplete_fields = ('delivery_person',)
 
 admin.site.register(Delivery, DeliveryAdmin)
 
-class NotificationAdmin(admin.ModelAdmin):
-    search_fields = ('user__username', 'seen', 'created_at')
+class NotificationAdmin(LargeTableAdmin):
+    search_fields = ('user__username',)
     list_display = ('user__username', 'seen', 'created_at')
-    list_filter = ('user__username', 'seen', 'created_at')
-    list_per_page = 15
+    list_filter = (('user__username', InputFilter), 'seen', 'created_at')
+    list_select_related = ('user',)
+    autocomplete_fields = ('user',)
 
 admin.site.register(Notification, NotificationAdmin)
+
+# Request profiles written by ProfilingMiddleware (api/profiling.py), superusers only
+def profile_index(request):
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    context = dict(
+        admin.site.each_context(request),
+        title='Request profiles',
+        profiles=list_profiles(),
+        enabled=settings.PROFILING_ENABLED,
+    )
+    return TemplateResponse(request, 'admin/profiles.html', context)
+
+def profile_detail(request, name):
+    if not request.user.is_superuser:
+        raise PermissionDenied
+    path = profile_path(name)
+    if path is None:
+        raise Http404
+    if 'download' in request.GET:
+        return FileResponse(path.open('rb'), as_attachment=True, filename=name)
+    context = dict(admin.site.each_context(request), title=name, name=name, summary=summarize(path))
+    return TemplateResponse(request, 'admin/profile_detail.html', context)
@@ -0,0 +1,83 @@
+import heapq
+from datetime import timedelta
+from functools import cmp_to_key
+from django.db import transaction
+from django.utils import timezone
+from .models import Order, OrderItem, ArchivedOrder, ArchivedOrderItem
+
+# Orders in these states never change again, so they can leave the hot tables
+ARCHIVABLE_STATUSES = ('delivered', 'cancelled')
+
+
+def archive_orders(older_than_days, batch_size=500):
+    """
+    Move delivered/cancelled orders older than `older_than_days` (and their items)
+    into the archive tables. Every batch runs in its own transaction so the hot
+    tables are never locked for long. Returns the number of orders moved.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    moved = 0
+
+    while True:
+        with transaction.atomic():
+            orders = list(
+                Order.objects.select_for_update(of=('self',))
+                .select_related('delivery')
+                .filter(status__in=ARCHIVABLE_STATUSES, created_at__lt=cutoff)
+                .order_by('created_at')[:batch_size]
+            )
+            if not orders:
+                break
+
+            archived_orders = []
+            for order in orders:
+                # Not every order has a delivery row
+                delivery = getattr(order, 'delivery', None)
+                archived_orders.append(ArchivedOrder(
+                    id=order.id,
+                    customer_id=order.customer_id,
+                    total_price=order.total_price,
+                    status=order.status,
+                    created_at=order.created_at,
+                    updated_at=order.updated_at,
+                    order_code=order.order_code,
+                    delivery_person_id=delivery.delivery_person_id if delivery else None,
+                    shipped_at=delivery.shipped_at if delivery else None,
+                    delivered_at=delivery.delivered_at if delivery else None,
+                ))
+
+            order_ids = [order.id for order in orders]
+            archived_items = [
+                ArchivedOrderItem(**item)
+                for item in OrderItem.objects.filter(order_id__in=order_ids).values(
+                    'id', 'order_id', 'product_id', 'seller_id', 'quantity', 'purchase_price'
+                )
+            ]
+
+            ArchivedOrder.objects.bulk_create(archived_orders)
+            ArchivedOrderItem.objects.bulk_create(archived_items)
+            # Cascades to the order items and delivery rows
+            Order.objects.filter(id__in=order_ids).delete()
+
+        moved += len(orders)
+
+    return moved
+
+
+def merge_tiers(orders, archived, ordering):
+    """
+    Orders from the `orders` and `archived` querysets as one list sorted by `ordering`
+    (order_by() field names) and then id, which archived orders keep. Each tier is
+    sorted by the database and the two are merged.
+    """
+    ordering = [*ordering, 'id']
+
+    def compare(a, b):
+        for field in ordering:
+            name = field.lstrip('-')
+            x, y = getattr(a, name), getattr(b, name)
+            if x != y:
+                return (-1 if x < y else 1) * (-1 if field.startswith('-') else 1)
+        return 0
+
+    return list(heapq.merge(orders.order_by(*ordering), archived.order_by(*ordering), key=cmp_to_key(compare)))
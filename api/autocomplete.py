@@ -0,0 +1,229 @@
+import heapq
+import re
+import threading
+import time
+from array import array
+from bisect import bisect_left, insort
+from sys import intern
+from django.conf import settings
+from django.db import connection, transaction
+from .models import Product
+
+WORD_RE = re.compile(r'\w+')
+# Sorts after every character, so keys[lo:hi] between prefix and prefix + END all start with prefix
+END = '\U0010ffff'
+
+
+def normalize(text):
+    return ' '.join(WORD_RE.findall(text.lower()))
+
+
+def product_terms(name, code, category_name):
+    """Strings a product can be found by: its name from any word on, its code and its category name"""
+    terms = set()
+    for text in (name, category_name):
+        words = normalize(text or '').split(' ')
+        terms.update(' '.join(words[i:]) for i in range(len(words)))
+    if code:
+        terms.add(code.lower())
+    terms.discard('')
+    return terms
+
+
+class AutocompleteIndex:
+    """
+    Sorted (term, product id) pairs kept as two parallel arrays, a prefix is a
+    bisect away from its matching range. Products changed after the build go into
+    a small sorted delta instead, with their old entries in the main arrays masked,
+    until the next rebuild. Ranges bigger than AUTOCOMPLETE_SCAN_LIMIT (short
+    prefixes like "a") have their top results cached.
+    """
+
+    def __init__(self, rows=(), scores=None):
+        self.scores = scores or {}
+        self.products = {}
+        self.top = {}
+        self.lock = threading.Lock()
+
+        pairs = []
+        for pk, name, code, category_name in rows:
+            self.products[pk] = (name, code, category_name)
+            pairs.extend((intern(term), pk) for term in product_terms(name, code, category_name))
+        pairs.sort()
+        self.keys = [term for term, _ in pairs]
+        self.ids = array('q', [pk for _, pk in pairs])
+        # Changes since the build
+        self.delta = []
+        self.masked = set()
+
+        # One and two character prefixes cover the most entries, rank them up front
+        pairs = {key[:2] for key in self.keys}
+        for prefix in sorted(pairs | {pair[0] for pair in pairs}):
+            self._top(prefix)
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.products)
+
+    def rank(self, pk):
+        # Best sellers first, newer products break ties
+        return self.scores.get(pk, 0), pk
+
+    def search(self, query, limit):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self.lock:
+            return [(pk, *self.products[pk][:2]) for pk in self._top(prefix)[:limit]]
+
+    def add(self, pk, name, code, category_name):
+        with self.lock:
+            self._remove(pk)
+            self.products[pk] = (name, code, category_name)
+            terms = product_terms(name, code, category_name)
+            for term in terms:
+                insort(self.delta, (term, pk))
+            # Slot the product into cached results it now belongs to
+            prefixes = {term[:i] for term in terms for i in range(1, len(term) + 1)}
+            for prefix in prefixes & self.top.keys():
+                best = self.top[prefix]
+                best.append(pk)
+                best.sort(key=self.rank, reverse=True)
+                del best[settings.AUTOCOMPLETE_MAX_LIMIT:]
+
+    def remove(self, pk):
+        with self.lock:
+            self._remove(pk)
+
+    def _top(self, prefix):
+        best = self.top.get(prefix)
+        if best is None:
+            lo = bisect_left(self.keys, prefix)
+            hi = bisect_left(self.keys, prefix + END, lo)
+            candidates = set(self.ids[lo:hi])
+            if self.masked:
+                candidates -= self.masked
+            if self.delta:
+                lo = bisect_left(self.delta, (prefix,))
+                hi = bisect_left(self.delta, (prefix + END,), lo)
+                candidates.update(pk for _, pk in self.delta[lo:hi])
+            best = heapq.nlargest(settings.AUTOCOMPLETE_MAX_LIMIT, candidates, key=self.rank)
+            if len(candidates) > settings.AUTOCOMPLETE_SCAN_LIMIT:
+                self.top[prefix] = best
+        return best
+
+    def _remove(self, pk):
+        product = self.products.pop(pk, None)
+        if product is None:
+            return
+        self.masked.add(pk)
+        terms = product_terms(*product)
+        for term in terms:
+            pos = bisect_left(self.delta, (term, pk))
+            if pos < len(self.delta) and self.delta[pos] == (term, pk):
+                del self.delta[pos]
+        # Cached results it drops out of are recomputed on the next search
+        for prefix in {term[:i] for term in terms for i in range(1, len(term) + 1)}:
+            best = self.top.get(prefix)
+            if best is not None and pk in best:
+                del self.top[prefix]
+
+
+_index = None
+_building = threading.Lock()
+# Changes made while an index is being built, replayed onto it before it replaces the current one
+_pending = None
+_pending_lock = threading.Lock()
+
+
+def load_index():
+    scores = {}
+    rows = Product.objects.values_list('id', 'name', 'product_code', 'category__name', 'sales_count')
+    return AutocompleteIndex(_with_scores(rows.iterator(chunk_size=10000), scores), scores)
+
+
+def _with_scores(rows, scores):
+    for pk, name, code, category_name, sales_count in rows:
+        if sales_count:
+            scores[pk] = sales_count
+        yield pk, name, code, category_name
+
+
+def _build():
+    """
+    Build a new index and swap it in. Changes committed while the products were read
+    may or may not be in it, so they are applied again (add and remove are idempotent).
+    """
+    global _index, _pending
+    with _pending_lock:
+        _pending = []
+    try:
+        index = load_index()
+    except BaseException:
+        with _pending_lock:
+            _pending = None
+        raise
+    with _pending_lock:
+        for change in _pending:
+            change(index)
+        _pending = None
+        _index = index
+
+
+def _apply(change):
+    """Run change(index) on the current index and on the one being built, if any"""
+    with _pending_lock:
+        if _pending is not None:
+            _pending.append(change)
+        index = _index
+    if index is not None:
+        change(index)
+
+
+def get_index():
+    """The process-wide index, built on first use and rebuilt in the background every AUTOCOMPLETE_REFRESH_SECONDS"""
+    if _index is None:
+        with _building:
+            if _index is None:
+                _build()
+    elif time.monotonic() - _index.built_at > settings.AUTOCOMPLETE_REFRESH_SECONDS:
+        refresh_index()
+    return _index
+
+
+def _rebuild():
+    try:
+        _build()
+    finally:
+        connection.close()
+        _building.release()
+
+
+def refresh_index():
+    """
+    Rebuild the index in a background thread, the old one keeps answering meanwhile.
+    Picks up changes signals don't see (queryset updates, other processes) and
+    popularity changes from new sales.
+    """
+    if _building.acquire(blocking=False):
+        threading.Thread(target=_rebuild, daemon=True).start()
+
+
+def preload():
+    """Start building the index when the server boots instead of on the first search"""
+    if settings.AUTOCOMPLETE_PRELOAD and _index is None and _building.acquire(blocking=False):
+        threading.Thread(target=_rebuild, daemon=True).start()
+
+
+def update_product(product):
+    """(Re)index `product` once the transaction that saved it commits"""
+    if _index is None and _pending is None:
+        return
+    category_name = product.category.name if product.category_id else None
+    entry = (product.pk, product.name, product.product_code, category_name)
+    transaction.on_commit(lambda: _apply(lambda index: index.add(*entry)))
+
+
+def remove_product(pk):
+    """Drop the product once the transaction that deleted it commits"""
+    transaction.on_commit(lambda: _apply(lambda index: index.remove(pk)))
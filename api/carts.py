@@ -0,0 +1,57 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+from .models import Cart, CartItem, AbandonedCart
+
+
+def expire_abandoned_carts(older_than_days, batch_size=1000, record_stats=True):
+    """
+    Delete carts (and their items) untouched for `older_than_days`, oldest first.
+    Every batch runs in its own transaction and skips carts a request is holding.
+    With record_stats a summary of every non-empty cart is kept in AbandonedCart.
+    Returns (carts deleted, items deleted).
+
+    Carts don't reserve stock, it is only taken at checkout, so there is nothing
+    to give back to SellerInventory here.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    carts_deleted = items_deleted = 0
+
+    while True:
+        with transaction.atomic():
+            carts = list(
+                Cart.objects.select_for_update(skip_locked=True)
+                .filter(updated_at__lt=cutoff)
+                .order_by('updated_at')
+                .values('id', 'user_id', 'cart_code', 'total_price', 'created_at', 'updated_at')[:batch_size]
+            )
+            if not carts:
+                break
+            cart_ids = [cart['id'] for cart in carts]
+
+            if record_stats:
+                totals = {
+                    row['cart_id']: row for row in
+                    CartItem.objects.filter(cart_id__in=cart_ids).order_by().values('cart_id')
+                    .annotate(item_count=Count('id'), quantity=Sum('quantity'))
+                }
+                AbandonedCart.objects.bulk_create([
+                    AbandonedCart(
+                        user_id=cart['user_id'],
+                        cart_code=cart['cart_code'],
+                        item_count=totals[cart['id']]['item_count'],
+                        quantity=totals[cart['id']]['quantity'],
+                        total_price=cart['total_price'],
+                        created_at=cart['created_at'],
+                        last_activity=cart['updated_at'],
+                    )
+                    for cart in carts if cart['id'] in totals
+                ])
+
+            # Items first as one plain DELETE, the carts then have nothing left to cascade to
+            items, _ = CartItem.objects.filter(cart_id__in=cart_ids).delete()
+            carts_deleted += Cart.objects.filter(id__in=cart_ids).delete()[1].get('api.Cart', 0)
+            items_deleted += items
+
+    return carts_deleted, items_deleted
@@ -0,0 +1,95 @@
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+
+PRIMARY_DB = 'default'
+REPLICA_DB = 'replica'
+# Cookie set on the client after a write so its next requests read from the primary
+PIN_COOKIE = 'db_pin'
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Routing state of the request being handled, set by ReplicaRoutingMiddleware
+_request_state = ContextVar('db_routing_state', default=None)
+
+
+def _pin_key(user_id):
+    return f'db-pin:{user_id}'
+
+
+class RequestRoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.safe = request.method in SAFE_METHODS
+        self.wrote = False
+        self.pinned = None
+
+    def replica_allowed(self):
+        if not self.safe or self.wrote:
+            return False
+        if self.pinned is None:
+            # Reads made while checking the pin (session, user) go to the primary
+            self.pinned = True
+            self.pinned = self._is_pinned()
+        return not self.pinned
+
+    def _is_pinned(self):
+        """True or False, None while the user isn't known yet"""
+        if PIN_COOKIE in self.request.COOKIES:
+            return True
+        user = getattr(self.request, 'user', None)
+        if user is None or not user.is_authenticated:
+            # DRF may still authenticate the user later on (Basic/token auth), so check again next time
+            return None
+        return cache.get(_pin_key(user.pk)) is not None
+
+
+def begin_request(request):
+    return _request_state.set(RequestRoutingState(request))
+
+
+def end_request(token):
+    state = _request_state.get()
+    _request_state.reset(token)
+    return state
+
+
+def pin_to_primary(request, response):
+    """Make the client that just wrote read from the primary for REPLICA_PIN_SECONDS"""
+    pin_seconds = settings.REPLICA_PIN_SECONDS
+    user = getattr(request, 'user', None)
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), 1, timeout=pin_seconds)
+    response.set_cookie(PIN_COOKIE, '1', max_age=pin_seconds, httponly=True, samesite='Lax')
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads from safe requests to the replica. Writes, reads inside
+    transaction.atomic(), reads after a write in the same request and reads from
+    clients that wrote in the last REPLICA_PIN_SECONDS go to the primary.
+    Anything outside a request (shell, management commands) uses the primary.
+    """
+
+    def db_for_read(self, model, **hints):
+        if REPLICA_DB not in settings.DATABASES:
+            return None
+        state = _request_state.get()
+        if state is None or connections[PRIMARY_DB].in_atomic_block:
+            return PRIMARY_DB
+        return REPLICA_DB if state.replica_allowed() else PRIMARY_DB
+
+    def db_for_write(self, model, **hints):
+        state = _request_state.get()
+        if state is not None:
+            state.wrote = True
+        return PRIMARY_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both databases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica gets its schema from the primary
+        return db == PRIMARY_DB
@@ -0,0 +1,115 @@
+import heapq
+from django.db import transaction
+from django.db.models import Count, Exists, OuterRef, Q
+from django.utils import timezone
+from .models import User, Order, Delivery, Notification
+
+# Orders that are waiting for a courier
+DISPATCHABLE_STATUSES = ('pending', 'processing')
+# Deliveries that still count towards a courier's load
+OPEN_DELIVERY_STATUSES = ('pending', 'processing', 'shipped')
+# Fields a delivery row needs for a status change, see apply_delivery_status()
+DELIVERY_STATUS_FIELDS = ('id', 'status', 'order_id', 'order__customer_id', 'order__order_code')
+
+# What the customer is told when their order moves to a status
+STATUS_MESSAGES = {
+    'processing': "Your order {code} is being processed",
+    'shipped': "Your order {code} has been shipped and is on its way",
+    'delivered': "Your order {code} has been delivered",
+    'cancelled': "Your order {code} has been cancelled",
+}
+
+
+def courier_loads():
+    """Open deliveries per active courier, computed in one aggregate query"""
+    return dict(
+        User.objects.filter(role='delivery', is_active=True)
+        .values('id')
+        .annotate(open_load=Count('delivery', filter=Q(delivery__status__in=OPEN_DELIVERY_STATUSES)))
+        .values_list('id', 'open_load')
+    )
+
+
+def dispatch_batch(batch_size, max_load=None):
+    """
+    Assign up to `batch_size` unassigned orders, oldest first, to the couriers with
+    the fewest open deliveries. Couriers at `max_load` are skipped.
+    Returns the number of deliveries created.
+    """
+    with transaction.atomic():
+        # Min-heap of (open deliveries, courier id)
+        couriers = [
+            (load, courier_id) for courier_id, load in courier_loads().items()
+            if max_load is None or load < max_load
+        ]
+        if not couriers:
+            return 0
+        heapq.heapify(couriers)
+
+        # Rows locked by another dispatcher are left for its batch
+        orders = list(
+            Order.objects.select_for_update(skip_locked=True)
+            .filter(status__in=DISPATCHABLE_STATUSES)
+            .filter(~Exists(Delivery.objects.filter(order=OuterRef('pk'))))
+            .order_by('created_at')
+            .values_list('id', 'status')[:batch_size]
+        )
+
+        deliveries = []
+        assigned = {}
+        for order_id, order_status in orders:
+            if not couriers:
+                break
+            load, courier_id = heapq.heappop(couriers)
+            deliveries.append(Delivery(order_id=order_id, delivery_person_id=courier_id, status=order_status))
+            assigned[courier_id] = assigned.get(courier_id, 0) + 1
+            if max_load is None or load + 1 < max_load:
+                heapq.heappush(couriers, (load + 1, courier_id))
+
+        Delivery.objects.bulk_create(deliveries)
+        Notification.objects.bulk_create([
+            Notification(user_id=courier_id, message=f"You have been assigned {count} new deliveries")
+            for courier_id, count in assigned.items()
+        ])
+
+    return len(deliveries)
+
+
+def split_transitions(deliveries, status):
+    """Split delivery rows into those allowed to move to `status` and those that are not"""
+    allowed, rejected = [], []
+    for delivery in deliveries:
+        if status in Order.STATUS_TRANSITIONS[delivery['status']]:
+            allowed.append(delivery)
+        else:
+            rejected.append(delivery)
+    return allowed, rejected
+
+
+def apply_delivery_status(deliveries, status):
+    """
+    Move delivery rows (dicts with DELIVERY_STATUS_FIELDS) and their orders to `status`.
+    One UPDATE for the deliveries, one for the orders and one bulk insert of customer
+    notifications, no matter how many deliveries there are. Transitions are not checked here.
+    """
+    if not deliveries:
+        return
+    now = timezone.now()
+
+    delivery_changes = {'status': status}
+    if status == 'shipped':
+        delivery_changes['shipped_at'] = now
+    elif status == 'delivered':
+        delivery_changes['delivered_at'] = now
+    Delivery.objects.filter(id__in=[d['id'] for d in deliveries]).update(**delivery_changes)
+    # update() skips auto_now, so updated_at is set here
+    Order.objects.filter(id__in=[d['order_id'] for d in deliveries]).update(status=status, updated_at=now)
+
+    if status in STATUS_MESSAGES:
+        Notification.objects.bulk_create([
+            Notification(
+                user_id=d['order__customer_id'],
+                message=STATUS_MESSAGES[status].format(code=d['order__order_code']),
+            )
+            for d in deliveries
+        ])
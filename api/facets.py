@@ -0,0 +1,56 @@
+import hashlib
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+from .singleflight import cached_flight, catalog_version
+
+# Query parameters that don't change which products match
+IGNORED_PARAMS = ('ordering', 'format', 'page')
+
+
+def price_bucket(edges):
+    """Index of the PRODUCT_PRICE_BUCKETS range a product's price falls in"""
+    whens = [When(price__lt=edge, then=Value(i)) for i, edge in enumerate(edges[1:])]
+    return Case(*whens, default=Value(len(edges) - 1), output_field=IntegerField())
+
+
+def compute_facets(queryset):
+    """Category counts and a price histogram for `queryset`, from one grouped query"""
+    edges = settings.PRODUCT_PRICE_BUCKETS
+    rows = (
+        queryset.order_by()
+        .annotate(bucket=price_bucket(edges))
+        .values('category_id', 'category__name', 'bucket')
+        .annotate(count=Count('id'))
+    )
+
+    categories = {}
+    histogram = [0] * len(edges)
+    for row in rows:
+        category = categories.setdefault(row['category_id'], {
+            'id': row['category_id'], 'name': row['category__name'], 'count': 0,
+        })
+        category['count'] += row['count']
+        histogram[row['bucket']] += row['count']
+
+    return {
+        'total': sum(histogram),
+        'categories': sorted(categories.values(), key=lambda c: -c['count']),
+        'price_histogram': [
+            {
+                'min': edges[i],
+                'max': edges[i + 1] if i + 1 < len(edges) else None,
+                'count': count,
+            }
+            for i, count in enumerate(histogram)
+        ],
+    }
+
+
+def cached_facets(request, queryset):
+    """compute_facets() cached per filter signature until the catalog changes"""
+    params = sorted(
+        (name, value) for name, values in request.query_params.lists()
+        for value in values if name not in IGNORED_PARAMS
+    )
+    signature = hashlib.sha1(repr(params).encode()).hexdigest()
+    return cached_flight(f'facets:{catalog_version()}:{signature}', lambda: compute_facets(queryset))
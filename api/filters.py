@@ -0,0 +1,44 @@
+import django_filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from .models import Product
+
+
+class ProductFilter(django_filters.FilterSet):
+    # Ranges on top of the exact category/price filters
+    price_min = django_filters.NumberFilter(field_name='price', lookup_expr='gte')
+    price_max = django_filters.NumberFilter(field_name='price', lookup_expr='lte')
+    posted_after = django_filters.DateTimeFilter(field_name='posted_at', lookup_expr='gte')
+
+    class Meta:
+        model = Product
+        fields = ['category', 'price', 'is_available', 'seller']
+
+
+class ProductOrderingFilter(OrderingFilter):
+    """
+    OrderingFilter that also takes ordering=popularity (best sellers first), ordering=trending
+    and their reverse (-popularity). Unknown fields are a 400 instead of being ignored.
+    """
+    aliases = {
+        'popularity': ('-sales_count', '-id'),
+        'trending': ('-trending_score', '-id'),
+    }
+
+    def remove_invalid_fields(self, queryset, fields, view, request):
+        expanded = []
+        invalid = []
+        for field in fields:
+            alias = self.aliases.get(field.lstrip('-'))
+            if alias is None:
+                terms = [field]
+            elif field.startswith('-'):
+                terms = [term[1:] if term.startswith('-') else f'-{term}' for term in alias]
+            else:
+                terms = list(alias)
+            if super().remove_invalid_fields(queryset, terms, view, request) != terms:
+                invalid.append(field)
+            expanded.extend(terms)
+        if invalid:
+            raise ValidationError({self.ordering_param: [f"Can't order by {', '.join(invalid)}"]})
+        return expanded
@@ -0,0 +1,101 @@
+import hashlib
+import json
+import time
+from datetime import timedelta
+from functools import wraps
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+# How often a duplicate request checks whether the first one has finished
+POLL_INTERVAL = 0.05
+
+
+def _request_hash(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha256(f'{request.method}:{request.path}:{body}'.encode()).hexdigest()
+
+
+def _claim(user, key, request_hash):
+    """Create the key row for this request, returns (row, True) or (existing row, False)"""
+    record = IdempotencyKey.objects.filter(user=user, key=key).first()
+    if record is not None:
+        # A row without a response past IDEMPOTENCY_INFLIGHT_TIMEOUT belongs to a request that crashed or was killed
+        ttl = settings.IDEMPOTENCY_KEY_TTL if record.status_code is not None else settings.IDEMPOTENCY_INFLIGHT_TIMEOUT
+        if record.created_at >= timezone.now() - timedelta(seconds=ttl):
+            return record, False
+        # Expired or abandoned but not purged yet, the key is free again
+        # (unless the abandoned request just finished after all)
+        IdempotencyKey.objects.filter(pk=record.pk, status_code=record.status_code).delete()
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(user=user, key=key, request_hash=request_hash), True
+    except IntegrityError:
+        # Another request with the same key got in first
+        return IdempotencyKey.objects.filter(user=user, key=key).first(), False
+
+
+def _replay(record, request_hash):
+    if record.request_hash != request_hash:
+        return Response({"error": f"{IDEMPOTENCY_HEADER} was already used for a different request"}, status=422)
+    return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
+
+
+def idempotent(view_func):
+    """
+    Makes a ViewSet action safe to retry with an Idempotency-Key header.
+    The first request runs and a successful response is stored, duplicates that arrive
+    while it is running wait for it, and later duplicates get the stored
+    response back without running the action again.
+    Requests without the header are not affected.
+    """
+    @wraps(view_func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        # Keys are scoped per user
+        if not key or not request.user.is_authenticated:
+            return view_func(self, request, *args, **kwargs)
+        if len(key) > 255:
+            return Response({"error": f"{IDEMPOTENCY_HEADER} can be at most 255 characters"}, status=400)
+
+        request_hash = _request_hash(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while True:
+            record, created = _claim(request.user, key, request_hash)
+            if created:
+                break
+            if record is not None and record.status_code is not None:
+                return _replay(record, request_hash)
+            if time.monotonic() > deadline:
+                return Response({"error": "A request with this Idempotency-Key is still being processed"}, status=409)
+            # Still in flight (or it failed and its row was just removed), check again shortly
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            response = view_func(self, request, *args, **kwargs)
+        except Exception:
+            # Nothing was stored, so a retry runs the action again
+            record.delete()
+            raise
+
+        if not 200 <= response.status_code < 300:
+            # Errors aren't final (the cart changes, a conflict clears), a retry runs again
+            record.delete()
+        else:
+            # Stored the way JSONRenderer sends it, so a replay renders the same body
+            stored = json.loads(JSONRenderer().render(response.data))
+            IdempotencyKey.objects.filter(pk=record.pk).update(status_code=response.status_code, response=stored)
+        return response
+
+    return wrapper
+
+
+def purge_expired_keys():
+    """Delete stored responses older than IDEMPOTENCY_KEY_TTL, returns the number deleted"""
+    cutoff = timezone.now() - timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL)
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=cutoff).delete()
+    return deleted
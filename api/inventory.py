@@ -0,0 +1,172 @@
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, OuterRef, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.lookups import GreaterThan
+from .ledger import locked_stock, record_movements
+from .lowstock import flag_low_stock, low_stock_flag
+from .models import InventoryMovement, Product, SellerInventory
+from .singleflight import bump_catalog_version
+
+STOCK_OPERATIONS = ('set', 'add', 'subtract')
+# Rows per UPDATE statement, a bulk adjustment runs as many of these in one transaction
+ADJUST_CHUNK_SIZE = 500
+
+
+def _new_stock(operation, quantity):
+    if operation == 'set':
+        return quantity
+    if operation == 'add':
+        return F('stock_quantity') + quantity
+    # Stock can't go below zero
+    return Greatest(F('stock_quantity') - quantity, Value(0))
+
+
+# What the operations above do to one row, for the movement ledger
+LEDGER_REASONS = {'set': 'adjustment', 'add': 'restock', 'subtract': 'adjustment'}
+
+
+def _movements(before, operation, quantities):
+    """InventoryMovement rows for applying {inventory_id: quantity} to `before` (see locked_stock)"""
+    movements = []
+    for pk, (product_id, stock) in before.items():
+        quantity = quantities[pk]
+        if operation == 'set':
+            new = quantity
+        elif operation == 'add':
+            new = stock + quantity
+        else:
+            new = max(stock - quantity, 0)
+        movements.append(InventoryMovement(
+            inventory_id=pk, product_id=product_id, change=new - stock, reason=LEDGER_REASONS[operation],
+        ))
+    return movements
+
+
+def _available(total):
+    """is_available for a stock total: the product is listed and somebody has it"""
+    return Case(When(listed=True, then=GreaterThan(total, 0)), default=Value(False))
+
+
+def _stock_total():
+    """SUM of a product's SellerInventory stock, for use in Product queries"""
+    totals = (
+        SellerInventory.objects.filter(product=OuterRef('pk')).order_by()
+        .values('product').annotate(total=Sum('stock_quantity')).values('total')
+    )
+    return Coalesce(Subquery(totals), 0)
+
+
+def refresh_products(product_ids):
+    """
+    Recompute total_stock from SellerInventory for `product_ids` (ids or an id subquery)
+    and set is_available of the listed ones to whether there is any, in one UPDATE
+    """
+    total = _stock_total()
+    updated = Product.objects.filter(id__in=product_ids).update(
+        total_stock=total, is_available=_available(total),
+    )
+    transaction.on_commit(bump_catalog_version)
+    return updated
+
+
+def apply_stock_deltas(deltas):
+    """
+    Add {product_id: change in stock} to the products' total_stock without re-reading
+    SellerInventory (for callers that know exactly what they changed), one UPDATE.
+    This is checkout's path, so cached catalog responses are only dropped when a product
+    goes on or off sale. Their total_stock may lag by up to SINGLEFLIGHT_TTL otherwise.
+    """
+    if not deltas:
+        return 0
+    ids = sorted(deltas)
+    total = F('total_stock') + Case(
+        *[When(id=pk, then=Value(deltas[pk])) for pk in ids],
+        output_field=IntegerField(),
+    )
+    products = Product.objects.filter(id__in=ids)
+    if products.exclude(is_available=_available(total)).exists():
+        transaction.on_commit(bump_catalog_version)
+    return products.update(total_stock=total, is_available=_available(total))
+
+
+def sync_product_availability(inventory):
+    """Refresh the products of the `inventory` queryset's rows"""
+    return refresh_products(inventory.values('product_id'))
+
+
+def adjust_stock(inventory, operation, quantity):
+    """Apply the same change to every row of the `inventory` queryset, returns the rows updated"""
+    with transaction.atomic():
+        before = locked_stock(inventory)
+        # Resolved up front, rows may stop matching `inventory` once their stock changes
+        ids = list(before) if before else list(inventory.values_list('id', flat=True))
+        new_stock = _new_stock(operation, Value(quantity))
+        updated = SellerInventory.objects.filter(id__in=ids).update(
+            stock_quantity=new_stock, low_stock_alerted_at=low_stock_flag(new_stock),
+        )
+        record_movements(_movements(before, operation, dict.fromkeys(before, quantity)))
+        flag_low_stock(ids)
+        sync_product_availability(SellerInventory.objects.filter(id__in=ids))
+    return updated
+
+
+def bulk_adjust_stock(adjustments, operation):
+    """
+    Apply {inventory_id: quantity} with one CASE UPDATE per ADJUST_CHUNK_SIZE rows,
+    all of them in a single transaction. Returns the rows updated.
+    """
+    ids = sorted(adjustments)
+    updated = 0
+    with transaction.atomic():
+        for i in range(0, len(ids), ADJUST_CHUNK_SIZE):
+            chunk = ids[i:i + ADJUST_CHUNK_SIZE]
+            before = locked_stock(SellerInventory.objects.filter(id__in=chunk))
+            quantity = Case(
+                *[When(id=pk, then=Value(adjustments[pk])) for pk in chunk],
+                output_field=IntegerField(),
+            )
+            new_stock = _new_stock(operation, quantity)
+            updated += SellerInventory.objects.filter(id__in=chunk).update(
+                stock_quantity=new_stock, low_stock_alerted_at=low_stock_flag(new_stock),
+            )
+            record_movements(_movements(before, operation, adjustments))
+            flag_low_stock(chunk)
+            sync_product_availability(SellerInventory.objects.filter(id__in=chunk))
+    return updated
+
+
+def set_availability(products, available):
+    """
+    Switch the `products` queryset on or off sale, returns the rows updated.
+    Products listed without stock become available once they are restocked.
+    """
+    updated = products.update(
+        listed=available, is_available=GreaterThan(F('total_stock'), 0) if available else Value(False),
+    )
+    transaction.on_commit(bump_catalog_version)
+    return updated
+
+
+def reconcile_products(batch_size=1000):
+    """
+    Fix products whose total_stock or is_available disagree with SellerInventory,
+    e.g. after rows were written with bulk_create or raw SQL. Walks the table in
+    id order, returns the number of products fixed.
+    """
+    fixed = 0
+    last_id = 0
+    while True:
+        batch = list(Product.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1]
+        wrong = list(
+            Product.objects.filter(id__in=batch)
+            .annotate(actual=_stock_total())
+            .annotate(should_be_available=_available(F('actual')))
+            .exclude(total_stock=F('actual'), is_available=F('should_be_available'))
+            .values_list('id', flat=True)
+        )
+        if wrong:
+            fixed += refresh_products(wrong)
+    return fixed
@@ -0,0 +1,44 @@
+import sys
+from django.utils.module_loading import import_string
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework.schemas.inspectors import DefaultSchema
+from rest_framework.settings import DEFAULTS, api_settings
+
+
+def lazy_view(dotted_path, **initkwargs):
+    """
+    View that imports the class at `dotted_path` on its first request instead of
+    when the URLconf loads, for rarely used views with heavy imports
+    """
+    view = None
+
+    @csrf_exempt
+    def dispatch(request, *args, **kwargs):
+        nonlocal view
+        if view is None:
+            view = import_string(dotted_path).as_view(**initkwargs)
+        return view(request, *args, **kwargs)
+    return dispatch
+
+
+class LazySchema(DefaultSchema):
+    """
+    View schema that doesn't import DEFAULT_SCHEMA_CLASS when a view class is only
+    being inspected (DRF's router reads every attribute of every viewset while building
+    the URLs). View instances, and classes once the schema class has been imported for
+    schema generation, get the usual schema.
+    """
+
+    def __get__(self, instance, owner):
+        path = api_settings.user_settings.get('DEFAULT_SCHEMA_CLASS', DEFAULTS['DEFAULT_SCHEMA_CLASS'])
+        if instance is None and isinstance(path, str) and path.rpartition('.')[0] not in sys.modules:
+            return self
+        return super().__get__(instance, owner)
+
+
+class LazySchemaMixin:
+    """
+    For the project's own views (api/views.py), so drf_spectacular isn't imported
+    while the router builds the URLs. Other views keep DRF's usual schema.
+    """
+    schema = LazySchema()
@@ -0,0 +1,109 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max, Sum
+from django.utils import timezone
+from .models import InventoryMovement, InventorySnapshot, SellerInventory
+
+# Rows per INSERT when writing movements or snapshots
+LEDGER_BATCH_SIZE = 1000
+
+
+def record_movements(movements):
+    """
+    Append InventoryMovement rows in one bulk INSERT, leaving out the ones that
+    didn't change anything. Returns the number written.
+    """
+    if not settings.INVENTORY_LEDGER_ENABLED:
+        return 0
+    movements = [movement for movement in movements if movement.change]
+    InventoryMovement.objects.bulk_create(movements, batch_size=LEDGER_BATCH_SIZE)
+    return len(movements)
+
+
+def locked_stock(inventory):
+    """
+    Lock the rows of the `inventory` queryset until the transaction ends and return
+    them as {id: (product_id, stock_quantity)}, so a bulk UPDATE's changes can be
+    logged exactly. Empty when the ledger is off.
+    """
+    if not settings.INVENTORY_LEDGER_ENABLED:
+        return {}
+    rows = inventory.select_for_update(of=('self',)).order_by('id').values_list('id', 'product_id', 'stock_quantity')
+    return {pk: (product_id, stock) for pk, product_id, stock in rows}
+
+
+def stock_at(inventory_id, when):
+    """
+    Stock of an inventory row at `when`: the nearest snapshot before it plus the
+    movements logged since. Two small indexed queries however long the history is,
+    None if `when` is before the row's history starts.
+    """
+    snapshot = (
+        InventorySnapshot.objects.filter(inventory_id=inventory_id, taken_at__lte=when)
+        .order_by('-taken_at').values_list('stock_quantity', 'last_movement_id').first()
+    )
+    if snapshot is None:
+        # Rows that predate the ledger only have a history from their baseline on
+        if InventorySnapshot.objects.filter(inventory_id=inventory_id, last_movement_id=0).exists():
+            return None
+        snapshot = (0, 0)
+    stock, last_movement_id = snapshot
+    change = InventoryMovement.objects.filter(
+        inventory_id=inventory_id, id__gt=last_movement_id, created_at__lte=when,
+    ).aggregate(change=Sum('change'))['change']
+    return stock + (change or 0)
+
+
+def take_snapshots(batch_size=LEDGER_BATCH_SIZE):
+    """
+    Snapshot every inventory row with movements since the last run, from its previous
+    snapshot plus those movements, so stock_at() never has to read more than one
+    period of the ledger. Movements newer than INVENTORY_SNAPSHOT_LAG_SECONDS are left
+    for the next run (their transactions may not have committed yet).
+
+    Returns (snapshots written, ids of rows whose stock_quantity disagrees with the
+    ledger), the latter only counting rows without newer movements.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.INVENTORY_SNAPSHOT_LAG_SECONDS)
+    # Every run snapshots all the rows it saw move, so no row has unsnapshotted
+    # movements before the previous run's watermark
+    since = InventorySnapshot.objects.aggregate(last=Max('last_movement_id'))['last'] or 0
+    until = InventoryMovement.objects.filter(id__gt=since, created_at__lt=cutoff).aggregate(last=Max('id'))['last']
+    if until is None:
+        return 0, []
+
+    changes = dict(
+        InventoryMovement.objects.filter(id__gt=since, id__lte=until)
+        .order_by().values('inventory_id').annotate(change=Sum('change'))
+        .values_list('inventory_id', 'change')
+    )
+    ids = sorted(changes)
+    written = 0
+    drifted = []
+    for i in range(0, len(ids), batch_size):
+        chunk = ids[i:i + batch_size]
+        latest = InventorySnapshot.objects.filter(inventory_id__in=chunk).values('inventory_id').annotate(last=Max('id')).values('last')
+        previous = dict(InventorySnapshot.objects.filter(id__in=latest).values_list('inventory_id', 'stock_quantity'))
+        snapshots = [
+            InventorySnapshot(
+                inventory_id=pk,
+                stock_quantity=previous.get(pk, 0) + changes[pk],
+                last_movement_id=until,
+                taken_at=cutoff,
+            )
+            for pk in chunk
+        ]
+        with transaction.atomic():
+            InventorySnapshot.objects.bulk_create(snapshots, batch_size=batch_size)
+        written += len(snapshots)
+
+        # Audit: rows that haven't moved since should still hold what the ledger says
+        moved = set(InventoryMovement.objects.filter(inventory_id__in=chunk, id__gt=until).values_list('inventory_id', flat=True))
+        live = dict(SellerInventory.objects.filter(id__in=chunk).values_list('id', 'stock_quantity'))
+        drifted += [
+            snapshot.inventory_id for snapshot in snapshots
+            if snapshot.inventory_id in live and snapshot.inventory_id not in moved
+            and live[snapshot.inventory_id] != snapshot.stock_quantity
+        ]
+    return written, drifted
@@ -0,0 +1,71 @@
+from django.db import connections, router, transaction
+from django.db.models import Case, F, Value, When
+from django.db.models.sql import UpdateQuery
+from django.utils import timezone
+from .models import Notification, SellerInventory
+
+
+def low_stock_flag(new_stock):
+    """
+    New value of low_stock_alerted_at when stock_quantity becomes `new_stock` (an
+    expression), for use in the same UPDATE: cleared once the row is back above its
+    reorder threshold, flag_low_stock() sets it
+    """
+    return Case(
+        When(reorder_threshold__lt=new_stock, then=Value(None)),
+        default=F('low_stock_alerted_at'),
+    )
+
+
+def _flag(inventory, now):
+    """Set low_stock_alerted_at=now on the rows of the `inventory` queryset, returns their ids"""
+    using = router.db_for_write(SellerInventory)
+    connection = connections[using]
+    # Backends that return columns from an INSERT do it from an UPDATE too
+    if not connection.features.can_return_columns_from_insert:
+        with transaction.atomic(using=using):
+            ids = list(inventory.using(using).select_for_update().values_list('id', flat=True))
+            SellerInventory.objects.using(using).filter(id__in=ids).update(low_stock_alerted_at=now)
+        return ids
+    query = inventory.query.chain(UpdateQuery)
+    query.add_update_values({'low_stock_alerted_at': now})
+    statement, params = query.get_compiler(using).as_sql()
+    with connection.cursor() as cursor:
+        cursor.execute(f'{statement} RETURNING {connection.ops.quote_name("id")}', params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def flag_low_stock(inventory_ids):
+    """
+    Flag the rows among `inventory_ids` that are at or below their reorder threshold
+    and not flagged yet, and notify their sellers. The rows come back from the flagging
+    UPDATE itself, so concurrent updates never claim each other's rows and rows
+    flagged earlier aren't notified again. Returns the notifications sent.
+    """
+    flagged = _flag(
+        SellerInventory.objects.filter(
+            id__in=inventory_ids, low_stock_alerted_at__isnull=True, reorder_threshold__gte=F('stock_quantity'),
+        ),
+        timezone.now(),
+    )
+    if not flagged:
+        return 0
+    rows = SellerInventory.objects.filter(id__in=flagged).values_list(
+        'seller_id', 'product__name', 'stock_quantity', 'reorder_threshold',
+    )
+    notifications = [
+        Notification(
+            user_id=seller_id,
+            message=f'{name} is out of stock' if not stock
+            else f'{name} is running low: {stock} left (reorder threshold {threshold})',
+        )
+        for seller_id, name, stock, threshold in rows
+    ]
+    Notification.objects.bulk_create(notifications)
+    return len(notifications)
+
+
+def check_low_stock(inventory):
+    """Flag and notify the rows of the `inventory` queryset at their current stock"""
+    inventory.update(low_stock_alerted_at=low_stock_flag(F('stock_quantity')))
+    return flag_low_stock(inventory.values('id'))
@@ -0,0 +1,56 @@
+import random
+import time
+from django.core.management.base import BaseCommand
+from api.autocomplete import AutocompleteIndex
+
+WORDS = (
+    'red blue green black white organic cotton wool leather steel wooden classic '
+    'premium mini pro max smart wireless portable kitchen garden office travel '
+    'shoes shirt jacket lamp chair table bottle bag watch phone speaker mat'
+).split()
+CATEGORIES = ['Clothing', 'Electronics', 'Home and Kitchen', 'Sports', 'Books', 'Beauty', 'Toys', 'Groceries']
+
+
+class Command(BaseCommand):
+    help = 'Build the autocomplete index over synthetic products and time prefix lookups'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000000)
+        parser.add_argument('--queries', type=int, default=10000)
+        parser.add_argument('--limit', type=int, default=10)
+
+    def handle(self, *args, **options):
+        rng = random.Random(0)
+        count = options['products']
+
+        rows = (
+            (pk, f'{" ".join(rng.sample(WORDS, 3))} {pk}', f'P{pk:08d}', rng.choice(CATEGORIES))
+            for pk in range(1, count + 1)
+        )
+        scores = {pk: rng.randrange(1000) for pk in range(1, count + 1)}
+        start = time.perf_counter()
+        index = AutocompleteIndex(rows, scores)
+        self.stdout.write(f'built {len(index.keys)} terms for {count} products in {time.perf_counter() - start:.1f} s')
+
+        # Mostly short prefixes of real words, like someone typing
+        queries = []
+        for _ in range(options['queries']):
+            source = rng.choice((rng.choice(WORDS), rng.choice(CATEGORIES), f'p{rng.randrange(count):08d}'))
+            queries.append(source[:rng.randint(1, len(source))])
+
+        for label in ('cold', 'warm'):
+            start = time.perf_counter()
+            for query in queries:
+                index.search(query, options['limit'])
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f'{label}: {len(queries)} queries, {elapsed / len(queries) * 1e6:.1f} us/query')
+
+        start = time.perf_counter()
+        for pk in range(count + 1, count + 1001):
+            index.add(pk, f'{" ".join(rng.sample(WORDS, 3))} {pk}', f'P{pk:08d}', rng.choice(CATEGORIES))
+        self.stdout.write(f'1000 incremental adds, {(time.perf_counter() - start):.3f} ms/add')
+
+        start = time.perf_counter()
+        for query in queries:
+            index.search(query, options['limit'])
+        self.stdout.write(f'after adds: {(time.perf_counter() - start) / len(queries) * 1e6:.1f} us/query')
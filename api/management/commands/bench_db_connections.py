@@ -0,0 +1,62 @@
+from time import perf_counter
+from django.core.management.base import BaseCommand
+from django.core.signals import request_started, request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+class Command(BaseCommand):
+    help = 'Measure database connection overhead per request for each connection configuration'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        settings_dict = connection.settings_dict
+        configured_max_age = settings_dict['CONN_MAX_AGE']
+        configured_pool = settings_dict['OPTIONS'].pop('pool', None)
+
+        profiles = [
+            ('new connection per request (CONN_MAX_AGE=0)', 0, None),
+            ('persistent connection (CONN_MAX_AGE=600)', 600, None),
+        ]
+        if configured_pool:
+            profiles.append(('psycopg connection pool', 0, configured_pool))
+
+        self.stdout.write(f"{settings_dict['ENGINE']} {settings_dict['NAME']}, {options['requests']} requests each")
+        try:
+            for label, max_age, pool in profiles:
+                # Reconnect so the new settings are picked up
+                connection.close()
+                settings_dict['CONN_MAX_AGE'] = max_age
+                if pool:
+                    settings_dict['OPTIONS']['pool'] = pool
+                per_request, opened = self.run_requests(connection, options['requests'])
+                self.stdout.write(f'  {label:<48} {per_request * 1000:8.3f} ms/request  {opened} connections opened')
+        finally:
+            connection.close()
+            settings_dict['CONN_MAX_AGE'] = configured_max_age
+            if configured_pool:
+                settings_dict['OPTIONS']['pool'] = configured_pool
+
+    def run_requests(self, connection, count):
+        opened = []
+
+        def on_connect(sender, connection, **kwargs):
+            opened.append(connection.alias)
+
+        connection_created.connect(on_connect)
+        try:
+            start = perf_counter()
+            for _ in range(count):
+                # Django closes obsolete connections on both signals, like a real request
+                request_started.send(sender=self.__class__)
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                request_finished.send(sender=self.__class__)
+            elapsed = perf_counter() - start
+        finally:
+            connection_created.disconnect(on_connect)
+        return elapsed / count, len(opened)
@@ -0,0 +1,83 @@
+import io
+import time
+from contextlib import redirect_stdout
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIRequestFactory, force_authenticate
+from api.models import Cart, CartItem, Category, Product, SellerInventory, SellerProfile, User
+from api.views import CartView
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Time checkouts with and without the inventory movement ledger, nothing is kept'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--checkouts', type=int, default=200)
+        parser.add_argument('--items', type=int, default=5, help='Cart lines per checkout')
+        parser.add_argument('--sellers', type=int, default=2, help='Sellers stocking every product')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                customer, products = self.setup(options['items'], options['sellers'])
+                for enabled in (False, True):
+                    with override_settings(INVENTORY_LEDGER_ENABLED=enabled):
+                        elapsed, queries = self.checkouts(customer, products, options['checkouts'])
+                    label = 'ledger on ' if enabled else 'ledger off'
+                    self.stdout.write(
+                        f"{label}: {options['checkouts']} checkouts of {options['items']} items, "
+                        f"{elapsed / options['checkouts'] * 1000:.2f} ms/checkout, "
+                        f"{queries / options['checkouts']:.1f} queries/checkout"
+                    )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def setup(self, items, sellers):
+        customer = User.objects.create(username='bench-ledger-customer', role='customer')
+        Cart.objects.create(user=customer)
+        category = Category.objects.create(name='bench-ledger')
+        profiles = []
+        for i in range(sellers):
+            seller = User.objects.create(username=f'bench-ledger-seller{i}', role='seller')
+            profiles.append(SellerProfile.objects.create(user=seller, company_name=f'Bench ledger {i}'))
+        products = [
+            Product.objects.create(
+                name=f'Bench ledger {i}', description='', price=10, category=category, seller=profiles[0].user,
+            )
+            for i in range(items)
+        ]
+        for profile in profiles:
+            for product in products:
+                # Enough stock that no run sells out
+                SellerInventory.objects.create(
+                    seller=profile.user, profile=profile, product=product, stock_quantity=10 ** 6,
+                )
+        return customer, products
+
+    def checkouts(self, customer, products, n):
+        view = CartView.as_view({'post': 'checkout'})
+        factory = APIRequestFactory()
+        cart = Cart.objects.get(user=customer)
+        elapsed = 0
+        queries = 0
+        # The order signal prints and sends an email
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'), redirect_stdout(io.StringIO()):
+            for _ in range(n):
+                CartItem.objects.bulk_create([CartItem(cart=cart, product=product, quantity=1) for product in products])
+                request = factory.post('/api/cart/checkout/')
+                force_authenticate(request, user=customer)
+                start = time.perf_counter()
+                with CaptureQueriesContext(connection) as captured:
+                    response = view(request)
+                elapsed += time.perf_counter() - start
+                queries += len(captured)
+                if response.status_code != 200 or 'order_id' not in response.data:
+                    raise RuntimeError(f'Checkout failed: {response.data}')
+        return elapsed, queries
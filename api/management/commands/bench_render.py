@@ -0,0 +1,70 @@
+import gzip
+import time
+from datetime import timedelta
+from decimal import Decimal
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from api.middleware import brotli
+from api.models import User, Product, Order, OrderItem
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import OrderSerializer
+
+
+class Command(BaseCommand):
+    help = 'Compare JSON encode time and response size for an /api/order/ payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--orders', type=int, default=10000)
+        parser.add_argument('--items', type=int, default=3, help='Items per order')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        data = OrderSerializer(self.build_orders(options['orders'], options['items']), many=True).data
+        self.stdout.write(f"{options['orders']} orders x {options['items']} items, orjson {'installed' if orjson else 'missing'}")
+
+        stdlib_body = JSONRenderer().render(data)
+        fast_body = FastJSONRenderer().render(data)
+        if stdlib_body != fast_body:
+            self.stderr.write('FastJSONRenderer output differs from JSONRenderer')
+
+        for label, renderer in (('JSONRenderer', JSONRenderer()), ('FastJSONRenderer', FastJSONRenderer())):
+            elapsed = self.best_of(options['repeat'], lambda: renderer.render(data))
+            self.stdout.write(f'  {label:<18} {elapsed * 1000:8.1f} ms')
+
+        self.stdout.write(f'  {"raw":<18} {len(fast_body):>10} bytes')
+        start = time.perf_counter()
+        gzipped = gzip.compress(fast_body, compresslevel=6)
+        self.stdout.write(f'  {"gzip":<18} {len(gzipped):>10} bytes  {(time.perf_counter() - start) * 1000:6.1f} ms')
+        if brotli is not None:
+            start = time.perf_counter()
+            compressed = brotli.compress(fast_body, quality=5)
+            self.stdout.write(f'  {"brotli":<18} {len(compressed):>10} bytes  {(time.perf_counter() - start) * 1000:6.1f} ms')
+
+    def best_of(self, repeat, fn):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    def build_orders(self, count, items_per_order):
+        """Unsaved orders with their items and customer already cached, so serializing needs no database"""
+        now = timezone.now()
+        customer = User(id=1, username='customer', role='customer')
+        products = [Product(id=i, name=f'Product {i}', price=Decimal('19.99') + i) for i in range(1, 51)]
+        orders = []
+        for i in range(1, count + 1):
+            order = Order(
+                id=i, customer=customer, total_price=Decimal('59.97'), status='pending',
+                created_at=now - timedelta(minutes=i), order_code=f'{i:06d}',
+            )
+            items = [
+                OrderItem(id=i * items_per_order + n, order=order, product=products[(i + n) % 50],
+                          quantity=n + 1, purchase_price=products[(i + n) % 50].price)
+                for n in range(items_per_order)
+            ]
+            order._prefetched_objects_cache = {'items': items}
+            orders.append(order)
+        return orders
@@ -0,0 +1,57 @@
+import threading
+import time
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test import override_settings
+from rest_framework.test import APIRequestFactory
+from api.views import ProductView
+
+
+class Command(BaseCommand):
+    help = 'Fire concurrent identical product requests and count DB queries with and without single-flight'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=5)
+        parser.add_argument('--path', default='/api/product/')
+
+    def handle(self, *args, **options):
+        for enabled in (False, True):
+            with override_settings(SINGLEFLIGHT_ENABLED=enabled):
+                cache.clear()
+                queries, elapsed = self.herd(options['path'], options['threads'], options['rounds'])
+            requests = options['threads'] * options['rounds']
+            label = 'single-flight on ' if enabled else 'single-flight off'
+            self.stdout.write(
+                f'{label}: {requests} requests, {queries} queries '
+                f'({queries / requests:.2f}/request), {elapsed * 1000:.1f} ms'
+            )
+
+    def herd(self, path, threads, rounds):
+        view = ProductView.as_view({'get': 'list'})
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(threads)
+        counts = []
+
+        def count_queries(execute, sql, params, many, context):
+            counts.append(1)
+            return execute(sql, params, many, context)
+
+        def client():
+            try:
+                with connection.execute_wrapper(count_queries):
+                    for _ in range(rounds):
+                        # Every thread sends its request at the same moment
+                        barrier.wait()
+                        view(factory.get(path))
+            finally:
+                connection.close()
+
+        workers = [threading.Thread(target=client) for _ in range(threads)]
+        start = time.perf_counter()
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        return len(counts), time.perf_counter() - start
@@ -0,0 +1,41 @@
+import time
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from api.throttling import RoleRateThrottle
+from api.views import CategoryView
+
+
+class Command(BaseCommand):
+    help = 'Measure the per-request cost of RoleRateThrottle'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        count = options['requests']
+        factory = APIRequestFactory()
+        request = Request(factory.get('/api/category/'))
+        request.user = AnonymousUser()
+        view = CategoryView(basename='category', action='list')
+        throttle = RoleRateThrottle()
+
+        # Different clients so the buckets never run dry
+        addresses = [f'10.{i // 65536 % 256}.{i // 256 % 256}.{i % 256}' for i in range(count)]
+        start = time.perf_counter()
+        for address in addresses:
+            request._request.META['REMOTE_ADDR'] = address
+            throttle.allow_request(request, view)
+        per_check = (time.perf_counter() - start) / count
+        self.stdout.write(f'allow_request: {per_check * 1e6:.2f} us/request over {count} clients')
+
+        # Whole request through the view, with and without the throttle
+        requests = min(count, 5000)
+        for label, throttles in (('without throttle', []), ('with throttle', [RoleRateThrottle])):
+            list_view = CategoryView.as_view({'get': 'list'}, throttle_classes=throttles)
+            start = time.perf_counter()
+            for i in range(requests):
+                list_view(factory.get('/api/category/', REMOTE_ADDR=addresses[i]))
+            per_request = (time.perf_counter() - start) / requests
+            self.stdout.write(f'GET /api/category/ {label}: {per_request * 1e6:.1f} us/request')
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.recommendations import compute_recommendations, np
+
+
+class Command(BaseCommand):
+    help = 'Precompute the "frequently bought together" products from the order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--incremental', action='store_true', help='Only redo products ordered since the last run')
+        parser.add_argument('--chunk-size', type=int, default=settings.RECOMMENDATION_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        if np is None:
+            self.stdout.write('numpy is not installed, counting pairs in Python')
+        changed = compute_recommendations(options['incremental'], chunk_size=options['chunk_size'])
+        if changed is None:
+            self.stdout.write(self.style.SUCCESS('Recomputed related products for the whole catalog'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Recomputed related products for {changed} products'))
@@ -0,0 +1,36 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.dispatch import dispatch_batch
+
+
+class Command(BaseCommand):
+    help = 'Assign unassigned pending/processing orders to delivery personnel in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=settings.DISPATCH_BATCH_SIZE)
+        parser.add_argument('--max-load', type=int, default=settings.DISPATCH_MAX_OPEN_PER_COURIER,
+                            help='Skip couriers that already have this many open deliveries')
+        parser.add_argument('--interval', type=float, default=0,
+                            help='Keep running and dispatch every INTERVAL seconds (default: run once)')
+
+    def handle(self, *args, **options):
+        while True:
+            self.dispatch(options['batch_size'], options['max_load'])
+            if not options['interval']:
+                break
+            time.sleep(options['interval'])
+
+    def dispatch(self, batch_size, max_load):
+        start = time.perf_counter()
+        assigned = batches = 0
+        # Drain the backlog, a short batch means there is nothing left (or no courier capacity)
+        while True:
+            count = dispatch_batch(batch_size, max_load=max_load)
+            assigned += count
+            batches += 1
+            if count < batch_size:
+                break
+        elapsed = time.perf_counter() - start
+        rate = assigned / elapsed if elapsed else 0
+        self.stdout.write(f'Dispatched {assigned} orders in {batches} batches, {elapsed:.3f}s ({rate:.0f} orders/s)')
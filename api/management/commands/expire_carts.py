@@ -0,0 +1,24 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from api.carts import expire_abandoned_carts
+
+
+class Command(BaseCommand):
+    help = 'Delete carts untouched for --days along with their items'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.CART_EXPIRE_AFTER_DAYS)
+        parser.add_argument('--batch-size', type=int, default=settings.CART_EXPIRE_BATCH_SIZE)
+        parser.add_argument('--no-stats', action='store_true', help="Don't record AbandonedCart rows")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        carts, items = expire_abandoned_carts(
+            options['days'], batch_size=options['batch_size'], record_stats=not options['no_stats'],
+        )
+        elapsed = time.perf_counter() - start
+        self.stdout.write(self.style.SUCCESS(
+            f"Deleted {carts} carts and {items} items untouched for {options['days']} days "
+            f"in {elapsed:.1f} s ({carts / elapsed if elapsed else 0:.0f} carts/s)"
+        ))
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from api.schema import code_version, generate_schema, write_schema
+
+
+class Command(BaseCommand):
+    help = 'Generate the OpenAPI schema for the current code version into SCHEMA_CACHE_DIR'
+
+    def handle(self, *args, **options):
+        path = write_schema(generate_schema())
+        self.stdout.write(self.style.SUCCESS(f'Wrote schema for version {code_version()} to {path}'))
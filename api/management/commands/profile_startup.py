@@ -0,0 +1,132 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs in a fresh interpreter, so nothing this process already imported is counted
+BOOT_SCRIPT = r'''
+import json, sys, time
+start = time.perf_counter()
+module = __import__(sys.argv[1], fromlist=['application'])
+booted = time.perf_counter()
+path, host = sys.argv[2], sys.argv[3]
+
+if sys.argv[1].endswith('asgi'):
+    from asgiref.sync import async_to_sync
+    from asgiref.testing import ApplicationCommunicator
+
+    async def first_request():
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'headers': [(b'host', host.encode())], 'server': (host, 80), 'client': ('127.0.0.1', 0),
+        }
+        communicator = ApplicationCommunicator(module.application, scope)
+        await communicator.send_input({'type': 'http.request', 'body': b''})
+        response = await communicator.receive_output(60)
+        await communicator.wait(60)
+        return response['status']
+
+    status = async_to_sync(first_request)()
+else:
+    from wsgiref.util import setup_testing_defaults
+    environ = {'PATH_INFO': path, 'HTTP_HOST': host}
+    setup_testing_defaults(environ)
+    statuses = []
+    body = module.application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    status = int(statuses[0].split()[0])
+
+done = time.perf_counter()
+print(json.dumps({
+    'boot_ms': (booted - start) * 1000,
+    'first_request_ms': (done - booted) * 1000,
+    'status': status,
+    'modules': sorted(sys.modules),
+}))
+'''
+
+
+def parse_importtime(stderr):
+    """`python -X importtime` output as [(module, self us, cumulative us), ...]"""
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        modules.append((name.strip(), int(self_us), int(cumulative_us)))
+    return modules
+
+
+class Command(BaseCommand):
+    help = (
+        'Boot project.wsgi or project.asgi in a fresh interpreter, report per-module import time '
+        'and the time to the first request, optionally failing over a budget'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--entry', choices=['wsgi', 'asgi'], default='wsgi')
+        parser.add_argument('--path', default='/api/category/', help='First request to time')
+        parser.add_argument('--host', default='localhost', help='Host header, must be in ALLOWED_HOSTS')
+        parser.add_argument('--top', type=int, default=25, help='Slowest modules to list')
+        parser.add_argument('--runs', type=int, default=3, help='Boots to run, the fastest counts')
+        parser.add_argument('--budget-ms', type=float, help='Fail when boot + first request takes longer')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', 'project.settings'))
+        # Building the autocomplete index in the background would skew the timings
+        env['AUTOCOMPLETE_PRELOAD'] = '0'
+        command = [
+            sys.executable, '-X', 'importtime', '-c', BOOT_SCRIPT,
+            f"project.{options['entry']}", options['path'], options['host'],
+        ]
+
+        best = None
+        for _ in range(options['runs']):
+            process = subprocess.run(command, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+            if process.returncode:
+                raise CommandError(f'Boot failed:\n{process.stderr[-2000:]}')
+            result = json.loads(process.stdout.strip().splitlines()[-1])
+            result['total_ms'] = result['boot_ms'] + result['first_request_ms']
+            if best is None or result['total_ms'] < best['total_ms']:
+                best, stderr = result, process.stderr
+
+        modules = parse_importtime(stderr)
+        packages = defaultdict(int)
+        for name, self_us, _ in modules:
+            packages[name.split('.')[0]] += self_us
+        report = {
+            'entry': f"project.{options['entry']}",
+            'status': best['status'],
+            'boot_ms': round(best['boot_ms'], 1),
+            'first_request_ms': round(best['first_request_ms'], 1),
+            'total_ms': round(best['total_ms'], 1),
+            'modules_loaded': len(best['modules']),
+            'slowest_modules': [
+                {'module': name, 'self_ms': self_us / 1000, 'cumulative_ms': cumulative_us / 1000}
+                for name, self_us, cumulative_us in sorted(modules, key=lambda m: -m[1])[:options['top']]
+            ],
+            'packages': {name: us / 1000 for name, us in sorted(packages.items(), key=lambda p: -p[1])[:options['top']]},
+        }
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+        else:
+            self.stdout.write(
+                f"{report['entry']}: boot {report['boot_ms']} ms, first request to {options['path']} "
+                f"({report['status']}) {report['first_request_ms']} ms, total {report['total_ms']} ms, "
+                f"{report['modules_loaded']} modules loaded"
+            )
+            self.stdout.write('\nSlowest modules (self / cumulative ms):')
+            for row in report['slowest_modules']:
+                self.stdout.write(f"  {row['self_ms']:8.1f} {row['cumulative_ms']:8.1f}  {row['module']}")
+            self.stdout.write('\nImport time by package (ms):')
+            for name, ms in report['packages'].items():
+                self.stdout.write(f'  {ms:8.1f}  {name}')
+
+        if options['budget_ms'] is not None and report['total_ms'] > options['budget_ms']:
+            raise CommandError(f"Boot + first request took {report['total_ms']} ms, budget is {options['budget_ms']} ms")
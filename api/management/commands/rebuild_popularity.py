@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.popularity import rebuild_popularity
+
+
+class Command(BaseCommand):
+    help = 'Recompute product sales counts and trending scores from the order history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        updated = rebuild_popularity(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Updated popularity for {updated} products'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from api.inventory import reconcile_products
+
+
+class Command(BaseCommand):
+    help = 'Recompute Product.total_stock/is_available where they disagree with SellerInventory'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        fixed = reconcile_products(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Fixed stock/availability of {fixed} products'))
@@ -0,0 +1,22 @@
+import time
+from django.core.management.base import BaseCommand
+from api.ledger import take_snapshots
+
+
+class Command(BaseCommand):
+    help = 'Snapshot the stock of inventory rows that moved since the last run (see api/ledger.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        written, drifted = take_snapshots(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Snapshotted {written} inventory rows in {time.perf_counter() - start:.1f} s'
+        ))
+        if drifted:
+            # Stock written without going through the ledger, e.g. raw SQL
+            self.stdout.write(self.style.WARNING(
+                f'{len(drifted)} rows disagree with the ledger: {", ".join(map(str, drifted[:20]))}'
+            ))
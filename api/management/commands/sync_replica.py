@@ -0,0 +1,28 @@
+import sqlite3
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from api.db_routers import PRIMARY_DB, REPLICA_DB
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary SQLite database into the replica SQLite file (local stand-in for replication)'
+
+    def handle(self, *args, **options):
+        if REPLICA_DB not in settings.DATABASES:
+            raise CommandError('No replica configured, set DB_REPLICA_NAME')
+
+        primary = settings.DATABASES[PRIMARY_DB]
+        replica = settings.DATABASES[REPLICA_DB]
+        for db in (primary, replica):
+            if db['ENGINE'] != 'django.db.backends.sqlite3':
+                raise CommandError('sync_replica only works with SQLite databases')
+
+        source = sqlite3.connect(primary['NAME'])
+        target = sqlite3.connect(replica['NAME'])
+        try:
+            source.backup(target)
+        finally:
+            source.close()
+            target.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Copied {primary['NAME']} to {replica['NAME']}"))
@@ -0,0 +1,163 @@
+import random
+import re
+import time
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.middleware.gzip import GZipMiddleware
+from django.urls import Resolver404, resolve
+from django.utils.cache import patch_vary_headers
+from django.utils.crypto import constant_time_compare
+from . import db_routers, profiling, querylog
+
+# brotli is optional, without it responses are only gzipped
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+ACCEPTS_BROTLI = re.compile(r'\bbr\b')
+# Only API responses are brotli'd. HTML (CSRF tokens, session data) goes through GZipMiddleware,
+# whose random padding of the gzip header is the BREACH mitigation brotli doesn't have
+BROTLI_CONTENT_TYPE = re.compile(r'^application/([\w.-]+\+)?json\b')
+
+
+def describe_view(match):
+    """Dotted path of a resolved view plus its URL name, which tells ViewSet actions apart (e.g. cart-checkout)"""
+    return f'{match._func_path}.{match.url_name}' if match.url_name else match._func_path
+
+
+class ReplicaRoutingMiddleware:
+    """Tracks each request for api.db_routers.PrimaryReplicaRouter"""
+
+    def __init__(self, get_response):
+        # Nothing to route without a replica
+        if db_routers.REPLICA_DB not in settings.DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = db_routers.begin_request(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            state = db_routers.end_request(token)
+        if state.wrote:
+            db_routers.pin_to_primary(request, response)
+        return response
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    GZipMiddleware that prefers brotli for JSON responses when the client accepts it
+    (and the brotli package is installed), and leaves responses under
+    COMPRESSION_MIN_SIZE alone.
+    """
+
+    def process_response(self, request, response):
+        if response.streaming:
+            return super().process_response(request, response)
+        if len(response.content) < settings.COMPRESSION_MIN_SIZE or response.has_header('Content-Encoding'):
+            return response
+
+        if (
+            brotli is None
+            or not BROTLI_CONTENT_TYPE.match(response.get('Content-Type', ''))
+            or not ACCEPTS_BROTLI.search(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        ):
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = brotli.compress(response.content, quality=settings.BROTLI_QUALITY)
+        # Return the original if compression didn't help
+        if len(compressed) >= len(response.content):
+            return response
+        response.content = compressed
+        response.headers['Content-Length'] = str(len(response.content))
+        # Same as GZipMiddleware, the body changed so a strong ETag becomes weak
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response.headers['ETag'] = 'W/' + etag
+        response.headers['Content-Encoding'] = 'br'
+        return response
+
+
+class ProfilingMiddleware:
+    """
+    Profiles selected requests (api/profiling.py): a random PROFILING_SAMPLE_RATE share
+    of them, plus any sending the PROFILING_HEADER with PROFILING_TOKEN or from a
+    superuser. PROFILING_VIEWS narrows it down to some views. Not installed at all
+    unless PROFILING_ENABLED is set.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PROFILING_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.wanted(request):
+            return self.get_response(request)
+        view = self.view_name(request)
+        if view is None:
+            return self.get_response(request)
+
+        start = time.perf_counter()
+        response, data, suffix = profiling.profile_call(lambda: self.render(self.get_response(request)))
+        elapsed = time.perf_counter() - start
+        try:
+            name = profiling.save_profile(data, suffix, request.method, view, elapsed, response.status_code)
+        except OSError:
+            # A full or read-only disk shouldn't fail the request
+            return response
+        response.headers['X-Profile-Id'] = name
+        return response
+
+    def wanted(self, request):
+        header = request.headers.get(settings.PROFILING_HEADER)
+        if header is not None:
+            if settings.PROFILING_TOKEN and constant_time_compare(header, settings.PROFILING_TOKEN):
+                return True
+            if request.user.is_superuser:
+                return True
+        return random.random() < settings.PROFILING_SAMPLE_RATE
+
+    def view_name(self, request):
+        """Dotted path of the view handling `request`, None if PROFILING_VIEWS leaves it out"""
+        try:
+            match = resolve(request.path_info, getattr(request, 'urlconf', None))
+        except Resolver404:
+            return None if settings.PROFILING_VIEWS else 'not-found'
+        if settings.PROFILING_VIEWS and not any(
+            selected in (match._func_path, match.url_name) for selected in settings.PROFILING_VIEWS
+        ):
+            return None
+        return describe_view(match)
+
+    @staticmethod
+    def render(response):
+        # DRF responses are rendered after the middleware, do it here so serialization is profiled too
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+
+
+class QueryLogMiddleware:
+    """
+    Times every query of a request and logs the request as JSON to the api.querylog
+    logger, as a warning when a query took over QUERYLOG_SLOW_MS or one query shape
+    ran QUERYLOG_DUPLICATE_THRESHOLD or more times (usually an N+1 in a serializer).
+    Not installed unless QUERYLOG_ENABLED.
+    """
+
+    def __init__(self, get_response):
+        if not settings.QUERYLOG_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        query_log = querylog.QueryLog()
+        with query_log.capture():
+            response = self.get_response(request)
+        match = request.resolver_match
+        querylog.log_request(query_log, request, response, describe_view(match) if match else None)
+        return response
@@ -0,0 +1,42 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:48
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_total_stock(apps, schema_editor):
+    # Products without stock go off sale, the ones switched off by hand stay off
+    Product = apps.get_model('api', 'Product')
+    SellerInventory = apps.get_model('api', 'SellerInventory')
+    totals = (
+        SellerInventory.objects.filter(product=OuterRef('pk')).order_by()
+        .values('product').annotate(total=Sum('stock_quantity')).values('total')
+    )
+    Product.objects.update(total_stock=Coalesce(Subquery(totals), 0))
+    Product.objects.filter(total_stock=0).update(is_available=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0021_seller_offers'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='total_stock',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='product',
+            name='is_available',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='product',
+            index=models.Index(condition=models.Q(('is_available', True)), fields=['category', 'price'], name='api_product_available_idx'),
+        ),
+        migrations.RunPython(fill_total_stock, migrations.RunPython.noop),
+    ]
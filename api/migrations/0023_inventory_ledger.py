@@ -0,0 +1,57 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:51
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def baseline_snapshots(apps, schema_editor):
+    # Existing rows have no movements, their history starts with their stock today
+    SellerInventory = apps.get_model('api', 'SellerInventory')
+    InventorySnapshot = apps.get_model('api', 'InventorySnapshot')
+    now = django.utils.timezone.now()
+    InventorySnapshot.objects.bulk_create(
+        (
+            InventorySnapshot(inventory_id=pk, stock_quantity=stock, last_movement_id=0, taken_at=now)
+            for pk, stock in SellerInventory.objects.values_list('id', 'stock_quantity').iterator()
+        ),
+        batch_size=1000,
+    )
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_product_total_stock'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventoryMovement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('change', models.IntegerField()),
+                ('reason', models.CharField(choices=[('created', 'Created'), ('sale', 'Sale'), ('restock', 'Restock'), ('adjustment', 'Adjustment'), ('removed', 'Removed')], max_length=20)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('inventory', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.sellerinventory')),
+                ('order', models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.order')),
+                ('product', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.product')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventory', 'id'], name='api_invento_invento_d7e61d_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='InventorySnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('stock_quantity', models.PositiveIntegerField()),
+                ('last_movement_id', models.BigIntegerField()),
+                ('taken_at', models.DateTimeField()),
+                ('inventory', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='api.sellerinventory')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventory', 'taken_at'], name='api_invento_invento_d9c66b_idx')],
+            },
+        ),
+        migrations.RunPython(baseline_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.3 on 2026-10-19 13:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0023_inventory_ledger'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sellerinventory',
+            name='low_stock_alerted_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='sellerinventory',
+            name='reorder_threshold',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddIndex(
+            model_name='sellerinventory',
+            index=models.Index(condition=models.Q(('stock_quantity__lte', models.F('reorder_threshold'))), fields=['seller', 'stock_quantity'], name='api_inventory_low_stock_idx'),
+        ),
+    ]
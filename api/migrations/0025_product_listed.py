@@ -0,0 +1,35 @@
+# Generated by Django 5.2.3 on 2026-10-19 14:16
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Q, Subquery, Sum
+from django.db.models.functions import Coalesce
+
+
+def fill_listed(apps, schema_editor):
+    # Off sale while in stock means a seller took it off, the rest stays listed.
+    # is_available is recomputed too, for databases migrated before 0022 backfilled it
+    Product = apps.get_model('api', 'Product')
+    SellerInventory = apps.get_model('api', 'SellerInventory')
+    totals = (
+        SellerInventory.objects.filter(product=OuterRef('pk')).order_by()
+        .values('product').annotate(total=Sum('stock_quantity')).values('total')
+    )
+    Product.objects.update(total_stock=Coalesce(Subquery(totals), 0))
+    Product.objects.filter(total_stock__gt=0, is_available=False).update(listed=False)
+    Product.objects.filter(Q(listed=False) | Q(total_stock=0)).update(is_available=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0024_low_stock_alerts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='listed',
+            field=models.BooleanField(default=True),
+        ),
+        migrations.RunPython(fill_listed, migrations.RunPython.noop),
+    ]
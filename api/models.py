@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
 from .utils import generate_random_code
 
 # Custom user for Role based use
@@ -40,8 +41,26 @@ class Product(models.Model):
     seller = models.ForeignKey(User, on_delete=models.CASCADE, limit_choices_to={'role': 'seller'})
     posted_at = models.DateTimeField(auto_now_add=True)
     image_url = models.URLField(blank=True, default='')
-    is_available = models.BooleanField(default=True, blank=False, null=False)
+    # listed and in stock (see total_stock), a new product goes on sale once a seller stocks it
+    is_available = models.BooleanField(default=False, blank=False, null=False)
+    # The seller's on/off sale switch (api.inventory.set_availability), stock changes leave it alone
+    listed = models.BooleanField(default=True)
     product_code = models.CharField(max_length=6, unique=True, default=generate_random_code)
+    # Kept up to date by checkout (see api/popularity.py)
+    sales_count = models.PositiveIntegerField(default=0, editable=False)
+    trending_score = models.FloatField(default=0, editable=False)
+    # Stock across every seller, kept in step with SellerInventory (see api/inventory.py)
+    # is_available follows it (for listed products), so listings don't need to join the inventory
+    total_stock = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # ordering=popularity / ordering=trending
+            models.Index(fields=['-sales_count', '-id']),
+            models.Index(fields=['-trending_score', '-id']),
+            # Storefront listings only look at products on sale
+            models.Index(fields=['category', 'price'], condition=models.Q(is_available=True), name='api_product_available_idx'),
+        ]
     
     def __str__(self):
         return self.name
@@ -51,6 +70,28 @@ class SellerInventory(models.Model):
     profile = models.ForeignKey(SellerProfile, on_delete=models.CASCADE, related_name='inventory', null=True, blank=True)
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
     stock_quantity = models.PositiveIntegerField()
+    # This seller's price for the product, empty means the product's price
+    price = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    # The seller is notified when stock drops to this, 0 means only when it runs out (see api/lowstock.py)
+    reorder_threshold = models.PositiveIntegerField(default=0)
+    # When the seller was told, cleared once the row is restocked above the threshold
+    low_stock_alerted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Only the few rows at or below their threshold, for /api/seller_inventory/low-stock/
+            models.Index(
+                fields=['seller', 'stock_quantity'], name='api_inventory_low_stock_idx',
+                condition=models.Q(stock_quantity__lte=models.F('reorder_threshold')),
+            ),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # If the row is moved to another product both products' stock changes
+        instance._loaded_product_id = dict(zip(field_names, values)).get('product_id')
+        return instance
 
     def __str__(self):
         return self.seller.username
@@ -62,7 +103,8 @@ class Cart(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     # auto_now=True: Updates the timestamp every time the object is saved. 
     # Ideal for updated_at or last_modified fields.
-    updated_at = models.DateTimeField(auto_now=True)
+    # Indexed for finding abandoned carts (see api/carts.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.0)
     cart_code = models.CharField(max_length=6, unique=True, default=generate_random_code)
 
@@ -84,6 +126,14 @@ class Order(models.Model):
         ('delivered', 'Delivered'),
         ('cancelled', 'Cancelled'),
     )
+    # Status changes an order (and its delivery) may make, delivered and cancelled are final
+    STATUS_TRANSITIONS = {
+        'pending': ('processing', 'shipped', 'cancelled'),
+        'processing': ('shipped', 'cancelled'),
+        'shipped': ('delivered', 'cancelled'),
+        'delivered': (),
+        'cancelled': (),
+    }
     customer = models.ForeignKey(User, limit_choices_to={'role': 'customer'}, on_delete=models.CASCADE)
     total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     status = models.CharField(choices=STATUS_CHOICES, default='pending')
@@ -91,12 +141,20 @@ class Order(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     order_code = models.CharField(max_length=6, unique=True, default=generate_random_code)
 
+    class Meta:
+        indexes = [
+            # Used by the archiver to find closed orders by age
+            models.Index(fields=['status', 'created_at']),
+        ]
+
     def __str__(self):
         return f"Order #{self.pk} by {self.customer.username}"
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name='items')
     product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    # The seller whose stock filled this item (see api/offers.py), empty for older orders
+    seller = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='sold_items')
     quantity = models.PositiveIntegerField()
     purchase_price = models.DecimalField(max_digits=10, decimal_places=2)
 
@@ -116,4 +174,115 @@ class Notification(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     message = models.TextField()
     seen = models.BooleanField(default=False)
-    created_at = models.DateTimeField(auto_now_add=True)
\ No newline at end of file
+    created_at = models.DateTimeField(auto_now_add=True)
+
+# Stored responses for requests sent with an Idempotency-Key header (see api/idempotency.py)
+class IdempotencyKey(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    # Hash of method, path and body, a key can't be reused for a different request
+    request_hash = models.CharField(max_length=64)
+    # Both stay empty while the first request is still running
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        unique_together = ('user', 'key')
+
+# Archive tier for closed orders (see api/archive.py)
+# Rows keep the primary key they had in the Order table
+class ArchivedOrder(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    customer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='archived_orders')
+    total_price = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
+    status = models.CharField(choices=Order.STATUS_CHOICES)
+    created_at = models.DateTimeField(db_index=True)
+    updated_at = models.DateTimeField()
+    order_code = models.CharField(max_length=6, unique=True)
+    # Delivery rows are not archived, so the useful bits are kept on the order
+    delivery_person = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='archived_deliveries')
+    shipped_at = models.DateTimeField(null=True, blank=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Archived order #{self.pk}"
+
+class ArchivedOrderItem(models.Model):
+    id = models.BigIntegerField(primary_key=True)
+    order = models.ForeignKey(ArchivedOrder, on_delete=models.CASCADE, related_name='items')
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)
+    seller = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    quantity = models.PositiveIntegerField()
+    purchase_price = models.DecimalField(max_digits=10, decimal_places=2)
+
+# Precomputed "frequently bought together" products (see api/recommendations.py)
+class RelatedProduct(models.Model):
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='related_products')
+    related = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='+')
+    # Number of orders containing both products
+    count = models.PositiveIntegerField()
+    score = models.FloatField()
+    # 0 is the best match
+    rank = models.PositiveSmallIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['product', 'rank']),
+        ]
+
+class RecommendationRun(models.Model):
+    started_at = models.DateTimeField(auto_now_add=True)
+    # Order items up to this id are reflected in RelatedProduct
+    last_item_id = models.BigIntegerField()
+    incremental = models.BooleanField(default=False)
+
+# Carts removed by `python manage.py expire_carts`, kept for analytics
+class AbandonedCart(models.Model):
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='abandoned_carts')
+    cart_code = models.CharField(max_length=6)
+    item_count = models.PositiveIntegerField()
+    quantity = models.PositiveIntegerField()
+    total_price = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField()
+    last_activity = models.DateTimeField()
+    abandoned_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+# Append-only log of every stock change (see api/ledger.py)
+# Rows outlive the inventory, order and product they point at, so there are no constraints
+class InventoryMovement(models.Model):
+    REASON_CHOICES = (
+        ('created', 'Created'),
+        ('sale', 'Sale'),
+        ('restock', 'Restock'),
+        ('adjustment', 'Adjustment'),
+        ('removed', 'Removed'),
+    )
+    inventory = models.ForeignKey(SellerInventory, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    product = models.ForeignKey(Product, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    # Signed change to stock_quantity
+    change = models.IntegerField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+    order = models.ForeignKey(Order, on_delete=models.DO_NOTHING, db_constraint=False, null=True, blank=True, related_name='+')
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Movements of one inventory row after a snapshot
+            models.Index(fields=['inventory', 'id']),
+        ]
+
+# Stock of an inventory row as of `taken_at`, so history is answered without replaying the whole ledger
+class InventorySnapshot(models.Model):
+    inventory = models.ForeignKey(SellerInventory, on_delete=models.DO_NOTHING, db_constraint=False, related_name='+')
+    stock_quantity = models.PositiveIntegerField()
+    # Ledger rows up to this id are included, 0 marks the baseline of a row older than the ledger
+    last_movement_id = models.BigIntegerField()
+    taken_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventory', 'taken_at']),
+        ]
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+from .ledger import record_movements
+from .lowstock import flag_low_stock
+from .models import InventoryMovement, SellerInventory
+
+# Sort keys for a product's offers, the first offer is used first
+OFFER_POLICIES = {
+    # Cheapest first, verified sellers win ties
+    'price': lambda offer: (offer['unit_price'], not offer['verified'], -offer['stock_quantity'], offer['id']),
+    # Biggest stock first so lines are split across as few sellers as possible
+    'stock': lambda offer: (-offer['stock_quantity'], offer['unit_price'], offer['id']),
+    # Verified sellers first, cheapest among them
+    'verified': lambda offer: (not offer['verified'], offer['unit_price'], offer['id']),
+}
+
+
+def load_offers(product_ids, lock=False):
+    """Every in-stock SellerInventory row of the products as {product_id: [offer, ...]}, one query"""
+    offers = SellerInventory.objects.filter(product_id__in=product_ids, stock_quantity__gt=0)
+    if lock:
+        # Held until the caller's transaction ends, so the stock can't change under us
+        offers = offers.select_for_update(of=('self',))
+    rows = offers.order_by('id').values(
+        'id', 'seller_id', 'product_id', 'stock_quantity',
+        unit_price=Coalesce('price', 'product__price'),
+        verified=Coalesce('seller__sellerprofile__verified', Value(False)),
+    )
+    by_product = defaultdict(list)
+    for row in rows:
+        by_product[row['product_id']].append(row)
+    return by_product
+
+
+def select_offers(lines, policy=None, lock=False):
+    """
+    Fill `lines` ([(product_id, quantity), ...]) from the sellers' stock following
+    `policy` (OFFER_POLICY by default), splitting a line across sellers when one
+    doesn't have enough. Returns (allocations, shortages): allocations are dicts with
+    product_id, inventory_id, seller_id, quantity and unit_price, shortages map
+    product ids that can't be filled to the stock there is.
+    """
+    sort_key = OFFER_POLICIES[policy or settings.OFFER_POLICY]
+    wanted = defaultdict(int)
+    for product_id, quantity in lines:
+        wanted[product_id] += quantity
+
+    offers = load_offers(list(wanted), lock=lock)
+    allocations = []
+    shortages = {}
+    for product_id, quantity in wanted.items():
+        candidates = sorted(offers.get(product_id, []), key=sort_key)
+        available = sum(offer['stock_quantity'] for offer in candidates)
+        if available < quantity:
+            shortages[product_id] = available
+            continue
+        for offer in candidates:
+            take = min(quantity, offer['stock_quantity'])
+            allocations.append({
+                'product_id': product_id,
+                'inventory_id': offer['id'],
+                'seller_id': offer['seller_id'],
+                'quantity': take,
+                'unit_price': offer['unit_price'],
+            })
+            quantity -= take
+            if not quantity:
+                break
+    return allocations, shortages
+
+
+def allocation_total(allocations, skip=0):
+    """Price of the allocated units, leaving out the first `skip` of them"""
+    total = 0
+    for allocation in allocations:
+        units = max(0, allocation['quantity'] - skip)
+        skip = max(0, skip - allocation['quantity'])
+        total += units * allocation['unit_price']
+    return total
+
+
+def decrement_stock(allocations, order=None):
+    """
+    Take the allocated quantities off the inventory rows in one UPDATE, flag the rows
+    that dropped to their reorder threshold (api/lowstock.py), log them as sales of
+    `order` and notify the sellers of the flagged rows, one bulk INSERT each
+    """
+    if not allocations:
+        return 0
+    ids = [a['inventory_id'] for a in allocations]
+    new_stock = F('stock_quantity') - Case(
+        *[When(id=a['inventory_id'], then=Value(a['quantity'])) for a in allocations],
+        output_field=IntegerField(),
+    )
+    # Stock only goes down here, so no flag needs clearing
+    updated = SellerInventory.objects.filter(id__in=ids).update(stock_quantity=new_stock)
+    flag_low_stock(ids)
+    record_movements([
+        InventoryMovement(
+            inventory_id=a['inventory_id'], product_id=a['product_id'], change=-a['quantity'],
+            reason='sale', order=order,
+        )
+        for a in allocations
+    ])
+    return updated
@@ -0,0 +1,71 @@
+from collections import defaultdict
+from datetime import datetime, time
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, F, FloatField, IntegerField, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from .models import Product, OrderItem, ArchivedOrderItem
+from .singleflight import bump_catalog_version
+
+
+def decay_weight(when):
+    """
+    Forward decay: a sale counts twice as much as one made TRENDING_HALF_LIFE_DAYS
+    earlier. Every product's score grows by the same factor over time, so ordering by
+    the stored sum is ordering by recency weighted sales without ever rewriting old scores.
+    """
+    days = (when - settings.TRENDING_EPOCH).total_seconds() / 86400
+    return 2 ** (days / settings.TRENDING_HALF_LIFE_DAYS)
+
+
+def record_sales(quantities, when=None):
+    """
+    Add {product_id: quantity} to the products' sales counters, one UPDATE for all of them.
+    Cached catalog responses are left alone, ordering by popularity catches up within SINGLEFLIGHT_TTL.
+    """
+    if not quantities:
+        return
+    weight = decay_weight(when or timezone.now())
+    # Rows in id order so concurrent checkouts lock them in the same order
+    ids = sorted(quantities)
+    Product.objects.filter(id__in=ids).update(
+        sales_count=F('sales_count') + Case(
+            *[When(id=pk, then=Value(quantities[pk])) for pk in ids],
+            output_field=IntegerField(),
+        ),
+        trending_score=F('trending_score') + Case(
+            *[When(id=pk, then=Value(quantities[pk] * weight)) for pk in ids],
+            output_field=FloatField(),
+        ),
+    )
+
+
+def rebuild_popularity(batch_size=1000):
+    """
+    Recompute every product's counters from the order history, archive included.
+    Sales are grouped by product and day, a day's sales share the weight of its noon.
+    Checkouts that land while this runs can be counted twice or not at all.
+    """
+    sales = defaultdict(lambda: [0, 0.0])
+    for model in (OrderItem, ArchivedOrderItem):
+        rows = (
+            model.objects.order_by()
+            .values('product_id', day=TruncDate('order__created_at'))
+            .annotate(quantity=Sum('quantity'))
+            .values_list('product_id', 'day', 'quantity')
+        )
+        for product_id, day, quantity in rows.iterator(chunk_size=batch_size):
+            noon = timezone.make_aware(datetime.combine(day, time(12)), timezone.get_current_timezone())
+            sales[product_id][0] += quantity
+            sales[product_id][1] += quantity * decay_weight(noon)
+
+    with transaction.atomic():
+        Product.objects.update(sales_count=0, trending_score=0)
+        products = [
+            Product(id=pk, sales_count=count, trending_score=score)
+            for pk, (count, score) in sales.items()
+        ]
+        Product.objects.bulk_update(products, ['sales_count', 'trending_score'], batch_size=batch_size)
+        transaction.on_commit(bump_catalog_version)
+    return len(products)
@@ -0,0 +1,118 @@
+import cProfile
+import io
+import marshal
+import pstats
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from django.conf import settings
+
+# <unix ms>_<method>_<view>_<ms>ms_<status>, .prof for cProfile and .collapsed for sampled stacks
+PROFILE_NAME = re.compile(r'^(?P<at>\d+)_(?P<method>[A-Z]+)_(?P<view>[\w.-]+)_(?P<ms>\d+)ms_(?P<status>\d+)(?P<suffix>\.prof|\.collapsed)$')
+
+
+class StackSampler:
+    """
+    Records the stack of one thread every `interval` seconds from a background thread,
+    the profiled code runs unchanged. Stacks come out in the collapsed format
+    ("outer;inner;leaf count" per line) that flamegraph.pl and speedscope read.
+    """
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{frame.f_globals.get('__name__', '?')}.{getattr(code, 'co_qualname', code.co_name)}")
+                frame = frame.f_back
+            if names:
+                self.stacks[';'.join(reversed(names))] += 1
+
+    def collapsed(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+def profile_dir():
+    return Path(settings.PROFILING_DIR)
+
+
+def profile_call(func, mode=None):
+    """Run func() under the PROFILING_MODE profiler, returns (result, profile file contents, suffix)"""
+    if (mode or settings.PROFILING_MODE) == 'sample':
+        with StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL_MS / 1000) as sampler:
+            result = func()
+        return result, sampler.collapsed().encode(), '.collapsed'
+
+    profiler = cProfile.Profile()
+    result = profiler.runcall(func)
+    profiler.create_stats()
+    # Same format as Profile.dump_stats()
+    return result, marshal.dumps(profiler.stats), '.prof'
+
+
+def save_profile(data, suffix, method, view, elapsed, status):
+    """Write a profile and drop the oldest ones past PROFILING_KEEP, returns the file name"""
+    folder = profile_dir()
+    folder.mkdir(parents=True, exist_ok=True)
+    view = re.sub(r'[^\w.-]', '-', view or 'unknown')[:80]
+    name = f'{int(time.time() * 1000)}_{method}_{view}_{int(elapsed * 1000)}ms_{status}{suffix}'
+    (folder / name).write_bytes(data)
+    for old in list_profiles()[settings.PROFILING_KEEP:]:
+        (folder / old['name']).unlink(missing_ok=True)
+    return name
+
+
+def list_profiles():
+    """Saved profiles newest first, as dicts of the fields in their file names"""
+    try:
+        names = [path.name for path in profile_dir().iterdir()]
+    except FileNotFoundError:
+        return []
+    profiles = []
+    for name in names:
+        match = PROFILE_NAME.match(name)
+        if match:
+            at = int(match['at'])
+            profiles.append(dict(
+                match.groupdict(), name=name, at=at, ms=int(match['ms']),
+                taken_at=datetime.fromtimestamp(at / 1000, tz=timezone.utc),
+            ))
+    return sorted(profiles, key=lambda profile: profile['at'], reverse=True)
+
+
+def profile_path(name):
+    """Path of a saved profile, None for anything that isn't one (e.g. ../ in the name)"""
+    if not PROFILE_NAME.match(name):
+        return None
+    path = profile_dir() / name
+    return path if path.is_file() else None
+
+
+def summarize(path, limit=40):
+    """Text report of a saved profile: top functions for pstats, hottest stacks for collapsed files"""
+    if path.suffix == '.prof':
+        out = io.StringIO()
+        pstats.Stats(str(path), stream=out).strip_dirs().sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
+    lines = path.read_text().splitlines()
+    return '\n'.join(lines[:limit])
@@ -0,0 +1,103 @@
+import json
+import logging
+import time
+from collections import defaultdict
+from contextlib import ExitStack, contextmanager
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger('api.querylog')
+
+
+class QueryLog:
+    """
+    Records every query run while installed as an execute_wrapper (see capture()),
+    with its duration. Queries are grouped by their SQL with placeholders, so the
+    same query run once per row of a list (N+1) shows up as one shape run N times.
+    """
+
+    def __init__(self):
+        # (database alias, sql, seconds)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append((context['connection'].alias, sql, time.perf_counter() - start))
+
+    @contextmanager
+    def capture(self):
+        """Record the queries of this thread on every configured database"""
+        with ExitStack() as stack:
+            for alias in settings.DATABASES:
+                stack.enter_context(connections[alias].execute_wrapper(self))
+            yield self
+
+    @property
+    def total_ms(self):
+        return sum(seconds for _, _, seconds in self.queries) * 1000
+
+    def slow(self, threshold_ms=None):
+        """Queries that took longer than threshold_ms (QUERYLOG_SLOW_MS)"""
+        threshold_ms = settings.QUERYLOG_SLOW_MS if threshold_ms is None else threshold_ms
+        return [
+            {'database': alias, 'sql': sql, 'ms': round(seconds * 1000, 2)}
+            for alias, sql, seconds in self.queries if seconds * 1000 > threshold_ms
+        ]
+
+    def duplicates(self, threshold=None):
+        """Query shapes run at least `threshold` (QUERYLOG_DUPLICATE_THRESHOLD) times, most repeated first"""
+        threshold = settings.QUERYLOG_DUPLICATE_THRESHOLD if threshold is None else threshold
+        shapes = defaultdict(lambda: [0, 0.0])
+        for alias, sql, seconds in self.queries:
+            shape = shapes[alias, sql]
+            shape[0] += 1
+            shape[1] += seconds
+        return sorted(
+            (
+                {'database': alias, 'sql': sql, 'count': count, 'ms': round(seconds * 1000, 2)}
+                for (alias, sql), (count, seconds) in shapes.items() if count >= threshold
+            ),
+            key=lambda shape: -shape['count'],
+        )
+
+    def report(self, **extra):
+        return dict(
+            extra,
+            queries=len(self.queries),
+            ms=round(self.total_ms, 2),
+            slow=self.slow(),
+            duplicates=self.duplicates(),
+        )
+
+
+def log_request(query_log, request, response, view):
+    """
+    Log the request's queries as one JSON line: a warning when there were slow or
+    repeated ones, otherwise at debug level
+    """
+    report = query_log.report(view=view, method=request.method, path=request.path, status=response.status_code)
+    level = logging.WARNING if report['slow'] or report['duplicates'] else logging.DEBUG
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps(report))
+    return report
+
+
+@contextmanager
+def assert_max_duplicate_queries(threshold=None):
+    """
+    Fails when the block runs any query shape `threshold` (QUERYLOG_DUPLICATE_THRESHOLD)
+    or more times, for tests guarding against N+1 queries:
+
+        with assert_max_duplicate_queries():
+            self.client.get('/api/product/')
+    """
+    query_log = QueryLog()
+    with query_log.capture():
+        yield query_log
+    duplicates = query_log.duplicates(threshold)
+    if duplicates:
+        details = '\n'.join(f"{shape['count']}x {shape['sql']}" for shape in duplicates)
+        raise AssertionError(f'Repeated queries (N+1?):\n{details}')
@@ -0,0 +1,209 @@
+import heapq
+import math
+from collections import Counter, defaultdict
+from itertools import permutations
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max
+from django.utils import timezone
+from .models import OrderItem, ArchivedOrderItem, RelatedProduct, RecommendationRun
+
+# numpy is optional, without it pairs are counted in plain Python
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Order items of every order, the archive holds the older history
+SOURCES = (OrderItem, ArchivedOrderItem)
+
+
+def baskets(queryset, chunk_size):
+    """
+    Stream the (order_id, product_id) pairs of `queryset` in chunks of about
+    chunk_size items, never splitting an order across two chunks
+    """
+    chunk = []
+    last_order = None
+    rows = queryset.order_by('order_id').values_list('order_id', 'product_id').iterator(chunk_size=chunk_size)
+    for order_id, product_id in rows:
+        if order_id != last_order and len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+        chunk.append((order_id, product_id))
+        last_order = order_id
+    if chunk:
+        yield chunk
+
+
+def order_counts():
+    """Number of orders each product appears in"""
+    counts = Counter()
+    for model in SOURCES:
+        counts.update(dict(
+            model.objects.order_by().values('product_id').annotate(orders=Count('order_id', distinct=True))
+            .values_list('product_id', 'orders')
+        ))
+    return counts
+
+
+class CoOccurrence:
+    """
+    Sparse product x product matrix of how many orders contain both products.
+    With `rows` set only pairs starting with one of those products are kept.
+    """
+
+    def __init__(self, rows=None, max_order_size=None):
+        self.rows = rows
+        self.max_order_size = max_order_size or settings.RECOMMENDATION_MAX_ORDER_SIZE
+        if np is not None:
+            # One (a, b) row per pair, sorted, any 64-bit product id fits
+            self.keys = np.empty((0, 2), dtype=np.int64)
+            self.counts = np.empty(0, dtype=np.int64)
+        else:
+            self.pairs = Counter()
+
+    def add(self, chunk):
+        if np is not None:
+            self._add_vectorized(chunk)
+            return
+        products = defaultdict(set)
+        for order_id, product_id in chunk:
+            products[order_id].add(product_id)
+        for basket in products.values():
+            if len(basket) > self.max_order_size:
+                continue
+            for a, b in permutations(basket, 2):
+                if self.rows is None or a in self.rows:
+                    self.pairs[a, b] += 1
+
+    def _add_vectorized(self, chunk):
+        # One row per (order, product), sorted by order
+        data = np.unique(np.array(chunk, dtype=np.int64), axis=0)
+        orders, products = data[:, 0], data[:, 1]
+        starts = np.flatnonzero(np.r_[True, orders[1:] != orders[:-1]])
+        sizes = np.diff(np.r_[starts, len(orders)])
+
+        # Very large orders (stock ups, bulk buys) say little about what goes together
+        keep = sizes <= self.max_order_size
+        products = products[np.repeat(keep, sizes)]
+        sizes = sizes[keep]
+        starts = np.cumsum(sizes) - sizes
+
+        # Every item paired with every item of its order, itself included
+        group_size = np.repeat(sizes, sizes)
+        left = np.repeat(np.arange(len(products)), group_size)
+        offset = np.arange(len(left)) - np.repeat(np.cumsum(group_size) - group_size, group_size)
+        right = np.repeat(np.repeat(starts, sizes), group_size) + offset
+        distinct = left != right
+        a, b = products[left[distinct]], products[right[distinct]]
+        if self.rows is not None:
+            wanted = np.isin(a, np.fromiter(self.rows, dtype=np.int64, count=len(self.rows)))
+            a, b = a[wanted], b[wanted]
+
+        keys, counts = np.unique(np.column_stack([a, b]), axis=0, return_counts=True)
+        keys, inverse = np.unique(np.concatenate([self.keys, keys]), axis=0, return_inverse=True)
+        self.counts = np.bincount(
+            inverse.ravel(), weights=np.concatenate([self.counts, counts]), minlength=len(keys),
+        ).astype(np.int64)
+        self.keys = keys
+
+    def top(self, n, orders):
+        """
+        (product, related, count, score, rank) for the n best related products of
+        every row, scored by cosine similarity so best sellers don't pair with everything
+        """
+        if np is not None:
+            yield from self._top_vectorized(n, orders)
+            return
+        rows = defaultdict(list)
+        for (a, b), count in self.pairs.items():
+            rows[a].append((count / math.sqrt(orders[a] * orders[b]), count, b))
+        for a in sorted(rows):
+            # Same tie breaks as the vectorized version, the lower product id wins
+            best = heapq.nlargest(n, rows[a], key=lambda row: (row[0], row[1], -row[2]))
+            for rank, (score, count, b) in enumerate(best):
+                yield a, b, count, score, rank
+
+    def _top_vectorized(self, n, orders):
+        if not len(self.keys):
+            return
+        a, b = self.keys[:, 0], self.keys[:, 1]
+        # Order counts looked up by id, a dense array indexed by id would be as big as the largest id
+        ids = np.fromiter(orders, dtype=np.int64, count=len(orders))
+        sorter = np.argsort(ids)
+        ids, totals = ids[sorter], np.fromiter(orders.values(), dtype=np.float64, count=len(orders))[sorter]
+        scores = self.counts / np.sqrt(totals[np.searchsorted(ids, a)] * totals[np.searchsorted(ids, b)])
+
+        # Best first within every row, then keep the first n of each
+        order = np.lexsort((-self.counts, -scores, a))
+        a, b, counts, scores = a[order], b[order], self.counts[order], scores[order]
+        starts = np.flatnonzero(np.r_[True, a[1:] != a[:-1]])
+        ranks = np.arange(len(a)) - np.repeat(starts, np.diff(np.r_[starts, len(a)]))
+        top = ranks < n
+        yield from zip(
+            a[top].tolist(), b[top].tolist(), counts[top].tolist(), scores[top].tolist(), ranks[top].tolist()
+        )
+
+
+def store(rows, batch_size=1000):
+    """Replace the RelatedProduct rows of every product in `rows` (sorted by product), batch by batch"""
+    batch = []
+    products = set()
+    for product_id, related_id, count, score, rank in rows:
+        if product_id not in products and len(products) >= batch_size:
+            _write(products, batch)
+            batch, products = [], set()
+        products.add(product_id)
+        batch.append(RelatedProduct(product_id=product_id, related_id=related_id, count=count, score=score, rank=rank))
+    if products:
+        _write(products, batch)
+
+
+def _write(products, batch):
+    with transaction.atomic():
+        RelatedProduct.objects.filter(product_id__in=products).delete()
+        RelatedProduct.objects.bulk_create(batch)
+
+
+def compute(products=None, chunk_size=None):
+    """Recompute the related products of `products` (all of them when None) from the full order history"""
+    chunk_size = chunk_size or settings.RECOMMENDATION_CHUNK_SIZE
+    matrix = CoOccurrence(rows=set(products) if products is not None else None)
+    for model in SOURCES:
+        queryset = model.objects.all()
+        if products is not None:
+            # Only the orders that contain one of the products
+            queryset = queryset.filter(order_id__in=model.objects.filter(product_id__in=products).values('order_id'))
+        for chunk in baskets(queryset, chunk_size):
+            matrix.add(chunk)
+    store(matrix.top(settings.RECOMMENDATION_TOP_N, order_counts()))
+
+
+def compute_recommendations(incremental=False, chunk_size=None):
+    """
+    Refresh RelatedProduct. A full run rebuilds every product. An incremental run
+    only redoes the products ordered since the last run, the related lists of
+    other products keep their old scores until the next full run.
+    Returns the number of products recomputed (None for a full run).
+    """
+    last_item_id = OrderItem.objects.aggregate(last=Max('id'))['last'] or 0
+    previous = RecommendationRun.objects.order_by('-started_at').first()
+
+    if incremental and previous is not None:
+        changed = sorted(set(
+            OrderItem.objects.filter(id__gt=previous.last_item_id, id__lte=last_item_id)
+            .values_list('product_id', flat=True)
+        ))
+        batch = settings.RECOMMENDATION_INCREMENTAL_BATCH
+        for i in range(0, len(changed), batch):
+            compute(changed[i:i + batch], chunk_size)
+        RecommendationRun.objects.create(last_item_id=last_item_id, incremental=True)
+        return len(changed)
+
+    started = timezone.now()
+    compute(chunk_size=chunk_size)
+    # Products that no longer show up in any order
+    RelatedProduct.objects.filter(updated_at__lt=started).delete()
+    RecommendationRun.objects.create(last_item_id=last_item_id)
+    return None
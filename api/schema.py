@@ -0,0 +1,111 @@
+import hashlib
+import json
+from functools import lru_cache
+from pathlib import Path
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils import translation
+from django.utils.cache import get_conditional_response
+from drf_spectacular.generators import SchemaGenerator
+from drf_spectacular.settings import spectacular_settings
+from drf_spectacular.views import SpectacularAPIView
+from rest_framework.utils import encoders
+from .singleflight import SingleFlight
+
+# Source folders whose code shapes the schema
+SOURCE_DIRS = ('api', 'project')
+
+_flight = SingleFlight()
+# (code version, api version, language, media type) -> rendered schema
+_rendered = {}
+
+
+@lru_cache(maxsize=None)
+def code_version():
+    """CODE_VERSION from the environment (e.g. the deployed git sha), else a hash of the source files"""
+    if settings.CODE_VERSION:
+        return settings.CODE_VERSION
+    digest = hashlib.sha1()
+    for folder in SOURCE_DIRS:
+        for path in sorted((Path(settings.BASE_DIR) / folder).rglob('*.py')):
+            stat = path.stat()
+            digest.update(f'{path.relative_to(settings.BASE_DIR)}:{stat.st_mtime_ns}:{stat.st_size}'.encode())
+    return digest.hexdigest()[:12]
+
+
+def schema_path(version=None):
+    return Path(settings.SCHEMA_CACHE_DIR) / f'openapi-{version or code_version()}.json'
+
+
+def generate_schema(generator_class=SchemaGenerator, request=None, **kwargs):
+    return generator_class(**kwargs).get_schema(request=request, public=spectacular_settings.SERVE_PUBLIC)
+
+
+def write_schema(schema):
+    """Save the schema for the current code version, removing files from older versions"""
+    path = schema_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    for old in path.parent.glob('openapi-*.json'):
+        if old != path:
+            old.unlink()
+    path.write_text(json.dumps(schema, cls=encoders.JSONEncoder))
+    return path
+
+
+def load_schema():
+    """Schema written for the current code version, or None"""
+    try:
+        return json.loads(schema_path().read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def get_default_schema(view, request):
+    schema = load_schema()
+    if schema is None:
+        schema = generate_schema(view.generator_class, request, urlconf=view.urlconf, patterns=view.patterns)
+        try:
+            write_schema(schema)
+        except OSError:
+            # Read-only deploys still work, they just regenerate on every boot
+            pass
+    return schema
+
+
+class CachedSchemaView(SpectacularAPIView):
+    """
+    SpectacularAPIView that generates the schema once per code version instead of on every request.
+    The default schema is read from SCHEMA_CACHE_DIR (`python manage.py generate_schema`)
+    or generated and written there on first use. Rendered output stays in memory and
+    is served with an ETag, so repeat fetches from Swagger/Redoc get a 304.
+    """
+
+    def _get_schema_response(self, request):
+        version = self.api_version or request.version or self._get_version_parameter(request)
+        renderer = request.accepted_renderer
+        key = (code_version(), version, translation.get_language(), request.accepted_media_type)
+        etag = '"%s"' % hashlib.sha1(repr(key).encode()).hexdigest()[:16]
+
+        # Weak comparison, compression middleware hands the ETag out as W/"..."
+        not_modified = get_conditional_response(request, etag=etag)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            return not_modified
+
+        if key not in _rendered:
+            _flight.do(key, lambda: self._render(request, renderer, key, version))
+
+        content_type = renderer.media_type
+        if renderer.charset:
+            content_type = f'{content_type}; charset={renderer.charset}'
+        response = HttpResponse(_rendered[key], content_type=content_type)
+        response['ETag'] = etag
+        response['Content-Disposition'] = f'inline; filename="{self._get_filename(request, version)}"'
+        return response
+
+    def _render(self, request, renderer, key, version):
+        if version is None and translation.get_language() == settings.LANGUAGE_CODE and not self.custom_settings:
+            schema = get_default_schema(self, request)
+        else:
+            schema = generate_schema(self.generator_class, request, urlconf=self.urlconf, api_version=version, patterns=self.patterns)
+        _rendered[key] = renderer.render(schema, request.accepted_media_type, self.get_renderer_context())
@@ -1,5 +1,11 @@
+import csv
+import io
 from rest_framework import serializers
-from .models import *
+from .models import (
+    ArchivedOrder, ArchivedOrderItem, Cart, CartItem, Category, Delivery, Notification, Order, OrderItem,
+    Product, SellerInventory, SellerProfile, User,
+)
+from .inventory import STOCK_OPERATIONS
 
 
 # User serializer for API responses
@@ -25,10 +31,8 @@ class SellerProfileSerializer(serializers.ModelSerializer):
         fields = ['id', 'user', 'company_name', 'verified', 'inventory']
 
     def get_inventory(self, obj):
-        return SellerInventorySerializer(
-            SellerInventory.objects.filter(seller=obj.user), 
-            many=True
-        ).data
+        # Prefetched by SellerProfileView
+        return SellerInventorySerializer(obj.user.sellerinventory_set.all(), many=True).data
 
 class CategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -41,7 +45,8 @@ class ProductSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = Product
-        fields = ['id', 'name', 'description', 'price', 'category', 'seller', 'posted_at', 'image_url', 'product_code']
+        fields = ['id', 'name', 'description', 'price', 'category', 'seller', 'posted_at', 'image_url', 'product_code', 'is_available', 'listed', 'total_stock']
+        read_only_fields = ['is_available', 'listed', 'total_stock']
 
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -63,7 +68,7 @@ class OrderItemSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = OrderItem
-        fields = ['id', 'product', 'product_name', 'quantity', 'purchase_price']
+        fields = ['id', 'product', 'product_name', 'seller', 'quantity', 'purchase_price']
 
 class OrderSerializer(serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
@@ -73,6 +78,22 @@ class OrderSerializer(serializers.ModelSerializer):
         model = Order
         fields = ['id', 'customer', 'customer_name', 'total_price', 'status', 'created_at', 'items', 'order_code']
 
+# Same shape as the order serializers so both tiers can be listed together
+class ArchivedOrderItemSerializer(serializers.ModelSerializer):
+    product_name = serializers.CharField(source='product.name', read_only=True)
+
+    class Meta:
+        model = ArchivedOrderItem
+        fields = ['id', 'product', 'product_name', 'seller', 'quantity', 'purchase_price']
+
+class ArchivedOrderSerializer(serializers.ModelSerializer):
+    items = ArchivedOrderItemSerializer(many=True, read_only=True)
+    customer_name = serializers.CharField(source='customer.username', read_only=True)
+
+    class Meta:
+        model = ArchivedOrder
+        fields = ['id', 'customer', 'customer_name', 'total_price', 'status', 'created_at', 'items', 'order_code']
+
 class DeliverySerializer(serializers.ModelSerializer):
     delivery_person = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
     shipped_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
@@ -82,6 +103,16 @@ class DeliverySerializer(serializers.ModelSerializer):
         model = Delivery
         fields = ['id', 'order', 'delivery_person', 'status', 'shipped_at', 'delivered_at']
 
+    def validate_status(self, value):
+        # Existing deliveries can only move along Order.STATUS_TRANSITIONS
+        if self.instance and value != self.instance.status and value not in Order.STATUS_TRANSITIONS[self.instance.status]:
+            raise serializers.ValidationError(f"Cannot change status from {self.instance.status} to {value}")
+        return value
+
+class BulkDeliveryStatusSerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=500)
+    status = serializers.ChoiceField(choices=Order.STATUS_CHOICES)
+
 class NotificationSerializer(serializers.ModelSerializer):
     created_at = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
     user = serializers.SlugRelatedField(slug_field='username', queryset=User.objects.all())
@@ -93,3 +124,38 @@ class NotificationSerializer(serializers.ModelSerializer):
 class AddToCartSerializer(serializers.Serializer):
     product_code = serializers.CharField(max_length=6) 
     quantity = serializers.IntegerField(min_value=1, default=1)
+
+class StockAdjustmentSerializer(serializers.Serializer):
+    # An inventory row by its id or by the code of its product
+    id = serializers.IntegerField(required=False)
+    product_code = serializers.CharField(max_length=6, required=False)
+    quantity = serializers.IntegerField(min_value=0)
+
+    def validate(self, data):
+        if ('id' in data) == ('product_code' in data):
+            raise serializers.ValidationError("Give either id or product_code")
+        return data
+
+class BulkStockAdjustSerializer(serializers.Serializer):
+    operation = serializers.ChoiceField(choices=STOCK_OPERATIONS)
+    items = StockAdjustmentSerializer(many=True, required=False)
+    # CSV with a header row: id or product_code, and quantity
+    file = serializers.FileField(required=False)
+
+    def validate(self, data):
+        if ('items' in data) == ('file' in data):
+            raise serializers.ValidationError("Send either items or a CSV file")
+        if 'file' in data:
+            rows = csv.DictReader(io.TextIOWrapper(data.pop('file'), encoding='utf-8-sig'))
+            # Empty cells count as missing
+            items = StockAdjustmentSerializer(data=[{k: v for k, v in row.items() if v} for row in rows], many=True)
+            if not items.is_valid():
+                raise serializers.ValidationError({'file': items.errors})
+            data['items'] = items.validated_data
+        if not data['items']:
+            raise serializers.ValidationError("Nothing to adjust")
+        return data
+
+class BulkAvailabilitySerializer(serializers.Serializer):
+    ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=20000)
+    is_available = serializers.BooleanField()
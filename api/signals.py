@@ -1,7 +1,13 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import pre_save, post_save, pre_delete, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from .models import Order
+from .models import Order, Product, Category, SellerInventory, InventoryMovement
 from django.core.mail import send_mail
+from .singleflight import bump_catalog_version
+from . import autocomplete
+from .inventory import refresh_products
+from .ledger import record_movements
+from .lowstock import check_low_stock
 
 # When new data is added in order receive a signal
 @receiver(post_save, sender=Order)
@@ -12,4 +18,71 @@ def on_create_order(sender, instance, created, **kwargs):
         message="Your order was successfully placed and is now being processed.",
         from_email=None, 
         recipient_list=['customer@kinmel.com.np'],
-    )
\ No newline at end of file
+    )
+
+# Cached product/category responses are stale once the catalog change is committed
+# (bumped earlier, a read in between would cache the old rows under the new version)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Category)
+def on_catalog_change(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+# Keep this process's autocomplete index in step with product changes
+@receiver(post_save, sender=Product)
+def on_product_save(sender, instance, **kwargs):
+    autocomplete.update_product(instance)
+
+@receiver(post_delete, sender=Product)
+def on_product_delete(sender, instance, **kwargs):
+    autocomplete.remove_product(instance.pk)
+
+# A renamed or deleted category changes the terms of all its products
+@receiver([post_save, post_delete], sender=Category)
+def on_category_change(sender, instance, **kwargs):
+    if not kwargs.get('created'):
+        transaction.on_commit(autocomplete.refresh_index)
+
+# Product.total_stock/is_available follow every inventory row saved or deleted one at a time
+# (API, admin), the bulk paths in api/inventory.py refresh them themselves
+@receiver([post_save, post_delete], sender=SellerInventory)
+def on_inventory_change(sender, instance, **kwargs):
+    products = {instance.product_id, getattr(instance, '_loaded_product_id', None)} - {None}
+    refresh_products(products)
+
+# Log stock changes made one row at a time, the bulk paths log their own.
+# The stored row is read back before the write as the instance may be stale.
+@receiver([pre_save, pre_delete], sender=SellerInventory)
+def before_inventory_change(sender, instance, **kwargs):
+    instance._stock_before = None
+    if not instance.pk:
+        return
+    stored = SellerInventory.objects.filter(pk=instance.pk).values_list('stock_quantity', 'low_stock_alerted_at').first()
+    if stored:
+        instance._stock_before, alerted_at = stored
+        # Checkout may have flagged the row since the instance was loaded, don't undo that
+        instance.low_stock_alerted_at = alerted_at
+
+@receiver(post_save, sender=SellerInventory)
+def on_inventory_save(sender, instance, **kwargs):
+    before = getattr(instance, '_stock_before', None)
+    if before is None:
+        change, reason = instance.stock_quantity, 'created'
+    else:
+        change = instance.stock_quantity - before
+        reason = 'restock' if change > 0 else 'adjustment'
+    record_movements([InventoryMovement(
+        inventory_id=instance.pk, product_id=instance.product_id, change=change, reason=reason,
+    )])
+
+@receiver(post_delete, sender=SellerInventory)
+def on_inventory_delete(sender, instance, **kwargs):
+    before = getattr(instance, '_stock_before', None)
+    record_movements([InventoryMovement(
+        inventory_id=instance.pk, product_id=instance.product_id,
+        change=-(instance.stock_quantity if before is None else before), reason='removed',
+    )])
+
+# Rows edited one at a time (API, admin) notify the seller like checkout does
+@receiver(post_save, sender=SellerInventory)
+def on_inventory_threshold(sender, instance, **kwargs):
+    check_low_stock(SellerInventory.objects.filter(pk=instance.pk))
@@ -0,0 +1,139 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.response import Response
+
+CATALOG_VERSION_KEY = 'catalog-version'
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Runs one computation per key at a time in this process, concurrent callers share its result"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+        return call.result
+
+
+_flight = SingleFlight()
+
+
+def catalog_version():
+    return cache.get_or_set(CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+def bump_catalog_version():
+    """Invalidate every cached catalog response, call it with transaction.on_commit() inside a write"""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, timeout=None)
+
+
+def _store(key, compute):
+    value = compute()
+    fresh_until = time.time() + settings.SINGLEFLIGHT_TTL
+    cache.set(key, (value, fresh_until), timeout=settings.SINGLEFLIGHT_TTL + settings.SINGLEFLIGHT_STALE_TTL)
+    return value
+
+
+def _fill(key, compute):
+    lock_key = f'{key}:lock'
+    if not cache.add(lock_key, 1, timeout=settings.SINGLEFLIGHT_LOCK_TIMEOUT):
+        # Another process is computing it, wait for its result before doing the work ourselves
+        deadline = time.monotonic() + settings.SINGLEFLIGHT_LOCK_TIMEOUT
+        while time.monotonic() < deadline:
+            time.sleep(0.01)
+            entry = cache.get(key)
+            if entry is not None:
+                return entry[0]
+    try:
+        return _store(key, compute)
+    finally:
+        cache.delete(lock_key)
+
+
+def cached_flight(key, compute):
+    """
+    Return the cached value for `key`, computing it with `compute()` when needed.
+    On a miss only one caller per process computes (others in the process wait for
+    it, others in other processes wait on a cache lock). Once the value is older than
+    SINGLEFLIGHT_TTL one caller refreshes it while everybody else keeps getting the
+    stale value for up to SINGLEFLIGHT_STALE_TTL.
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return _flight.do(key, lambda: _fill(key, compute))
+
+    value, fresh_until = entry
+    if time.time() < fresh_until:
+        return value
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, timeout=settings.SINGLEFLIGHT_LOCK_TIMEOUT):
+        try:
+            return _flight.do(key, lambda: _store(key, compute))
+        finally:
+            cache.delete(lock_key)
+    return value
+
+
+class SingleFlightMixin:
+    """
+    Serves list/retrieve of a public, read only ViewSet through cached_flight().
+    Cached responses (data, status and the headers the view set) are dropped
+    whenever the catalog version is bumped, which writes to products or categories
+    do once committed (signals and the bulk helpers in api/inventory.py and api/popularity.py).
+    Checkout only bumps it when a product sells out, so stock counts and popularity
+    order in cached responses can be up to SINGLEFLIGHT_TTL old.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.single_flight(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.single_flight(super().retrieve, request, *args, **kwargs)
+
+    def single_flight(self, handler, request, *args, **kwargs):
+        if not settings.SINGLEFLIGHT_ENABLED:
+            return handler(request, *args, **kwargs)
+        key = f'flight-response:{catalog_version()}:{request.get_full_path()}'
+
+        def compute():
+            response = handler(request, *args, **kwargs)
+            # Content-Type is set again when the replayed response is rendered
+            headers = {name: value for name, value in response.items() if name != 'Content-Type'}
+            return response.data, response.status_code, headers
+
+        data, status, headers = cached_flight(key, compute)
+        return Response(data, status=status, headers=headers)
@@ -0,0 +1,16 @@
+from django.core.cache import caches
+from django.test import TestCase as DjangoTestCase
+from .. import autocomplete
+
+
+class TestCase(DjangoTestCase):
+    """
+    Each test runs in a transaction that is rolled back afterwards. Caches and the
+    in-process autocomplete index would outlive it, so they start empty every test.
+    """
+
+    def setUp(self):
+        super().setUp()
+        for cache in caches.all():
+            cache.clear()
+        autocomplete._index = autocomplete._pending = None
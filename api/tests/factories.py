@@ -0,0 +1,333 @@
+"""
+Model factories for tests, one per model in api/models.py.
+
+    products = ProductFactory.create_batch(50, category=category)
+    order = OrderFactory.create(customer=customer)
+
+create_batch() writes each model with one bulk INSERT, related rows a factory needs
+(SubFactory) are bulk created first, one per row. Like any bulk_create no save()
+runs, so signals don't fire: no order email, ledger rows or autocomplete updates.
+Denormalized columns the signals would keep up (Product.total_stock/is_available)
+and the cached catalog version are refreshed by the factories that change them.
+"""
+from itertools import count, cycle
+from django.contrib.auth.hashers import make_password
+from django.utils import timezone
+from django.utils.http import int_to_base36
+from ..inventory import refresh_products
+from ..singleflight import bump_catalog_version
+from ..models import (
+    User, SellerProfile, Category, Product, SellerInventory, Cart, CartItem, Order, OrderItem,
+    Delivery, Notification, IdempotencyKey, ArchivedOrder, ArchivedOrderItem, RelatedProduct,
+    RecommendationRun, AbandonedCart, InventoryMovement, InventorySnapshot,
+)
+
+# Shared by every factory, so sequence numbers are unique within a test process
+_sequence = count(1)
+_passwords = {}
+
+PASSWORD = 'password'
+
+
+def hashed_password(raw=PASSWORD):
+    """make_password() once per raw password, hashing is the slow part of creating users"""
+    if raw not in _passwords:
+        _passwords[raw] = make_password(raw)
+    return _passwords[raw]
+
+
+def code(prefix, n):
+    """6 character code unique per sequence number, for the product/cart/order codes"""
+    return f'{prefix}{int_to_base36(n).upper():0>5}'
+
+
+class SubFactory:
+    """A related row per built row, created by `factory` with `fields`"""
+
+    def __init__(self, factory, **fields):
+        self.factory = factory
+        self.fields = fields
+
+
+class Each:
+    """One of `values` per row, in turn, starting over when they run out"""
+
+    def __init__(self, values):
+        self.values = list(values)
+
+
+class Lazy:
+    """A value computed from the row's other fields, e.g. Lazy(lambda row: row['product'].price)"""
+
+    def __init__(self, func):
+        self.func = func
+
+
+class Factory:
+    """
+    `defaults` maps field names to a value, a function of the row's sequence number,
+    a SubFactory, an Each or a Lazy. Keyword arguments override them the same way,
+    a model instance given for a relation is shared by every row of the batch.
+    """
+
+    model = None
+    defaults = {}
+
+    @classmethod
+    def build_batch(cls, size, **fields):
+        """Unsaved instances, related rows from SubFactory are created though"""
+        declared = dict(cls.defaults, **fields)
+        rows = [{} for _ in range(size)]
+        each = {name: cycle(value.values) for name, value in declared.items() if isinstance(value, Each)}
+
+        for row in rows:
+            n = next(_sequence)
+            for name, value in declared.items():
+                if name in each:
+                    row[name] = next(each[name])
+                elif not isinstance(value, (SubFactory, Lazy)):
+                    row[name] = value(n) if callable(value) else value
+
+        for name, value in declared.items():
+            if isinstance(value, SubFactory):
+                related = value.factory.create_batch(size, **value.fields)
+                for row, obj in zip(rows, related):
+                    row[name] = obj
+
+        for name, value in declared.items():
+            if isinstance(value, Lazy):
+                for row in rows:
+                    row[name] = value.func(row)
+
+        return [cls.model(**row) for row in rows]
+
+    @classmethod
+    def build(cls, **fields):
+        return cls.build_batch(1, **fields)[0]
+
+    @classmethod
+    def create_batch(cls, size, **fields):
+        if not size:
+            return []
+        objs = cls.model.objects.bulk_create(cls.build_batch(size, **fields))
+        cls.after_create(objs)
+        return objs
+
+    @classmethod
+    def create(cls, **fields):
+        return cls.create_batch(1, **fields)[0]
+
+    @classmethod
+    def after_create(cls, objs):
+        """Hook for keeping denormalized data in step after the INSERT"""
+
+
+class UserFactory(Factory):
+    model = User
+    defaults = {
+        'username': lambda n: f'user{n}',
+        'email': lambda n: f'user{n}@kinmel.com.np',
+        'role': 'customer',
+        # Pass password=hashed_password('...') for another one
+        'password': lambda n: hashed_password(),
+    }
+
+    @classmethod
+    def create_superuser(cls, **fields):
+        return cls.create(**dict({'role': 'admin', 'is_staff': True, 'is_superuser': True}, **fields))
+
+
+class SellerProfileFactory(Factory):
+    model = SellerProfile
+    defaults = {
+        'user': SubFactory(UserFactory, role='seller'),
+        'company_name': lambda n: f'Company {n}',
+    }
+
+
+class CategoryFactory(Factory):
+    model = Category
+    defaults = {
+        'name': lambda n: f'Category {n}',
+    }
+
+    @classmethod
+    def after_create(cls, objs):
+        bump_catalog_version()
+
+
+class ProductFactory(Factory):
+    model = Product
+    defaults = {
+        'name': lambda n: f'Product {n}',
+        'description': '',
+        'price': 10,
+        'category': SubFactory(CategoryFactory),
+        'seller': SubFactory(UserFactory, role='seller'),
+        'product_code': lambda n: code('P', n),
+    }
+
+    @classmethod
+    def after_create(cls, objs):
+        bump_catalog_version()
+
+
+class SellerInventoryFactory(Factory):
+    model = SellerInventory
+    defaults = {
+        'product': SubFactory(ProductFactory),
+        'seller': Lazy(lambda row: row['product'].seller),
+        'stock_quantity': 10,
+    }
+
+    @classmethod
+    def after_create(cls, objs):
+        product_ids = {obj.product_id for obj in objs}
+        refresh_products(product_ids)
+        # Instances handed to the factory (or returned by ProductFactory) are stale otherwise
+        totals = dict(Product.objects.filter(id__in=product_ids).values_list('id', 'total_stock'))
+        for obj in objs:
+            if obj.product.pk in totals:
+                obj.product.total_stock = totals[obj.product.pk]
+                obj.product.is_available = totals[obj.product.pk] > 0
+
+
+class CartFactory(Factory):
+    model = Cart
+    defaults = {
+        'user': SubFactory(UserFactory),
+        'cart_code': lambda n: code('C', n),
+    }
+
+
+class CartItemFactory(Factory):
+    model = CartItem
+    defaults = {
+        'cart': SubFactory(CartFactory),
+        'product': SubFactory(ProductFactory),
+        'quantity': 1,
+    }
+
+
+class OrderFactory(Factory):
+    model = Order
+    defaults = {
+        'customer': SubFactory(UserFactory),
+        'total_price': 10,
+        'status': 'pending',
+        'order_code': lambda n: code('O', n),
+    }
+
+
+class OrderItemFactory(Factory):
+    model = OrderItem
+    defaults = {
+        'order': SubFactory(OrderFactory),
+        'product': SubFactory(ProductFactory),
+        'seller': Lazy(lambda row: row['product'].seller),
+        'quantity': 1,
+        'purchase_price': Lazy(lambda row: row['product'].price),
+    }
+
+
+class DeliveryFactory(Factory):
+    model = Delivery
+    defaults = {
+        'order': SubFactory(OrderFactory),
+        'delivery_person': SubFactory(UserFactory, role='delivery'),
+        'status': 'pending',
+    }
+
+
+class NotificationFactory(Factory):
+    model = Notification
+    defaults = {
+        'user': SubFactory(UserFactory),
+        'message': lambda n: f'Notification {n}',
+    }
+
+
+class IdempotencyKeyFactory(Factory):
+    model = IdempotencyKey
+    defaults = {
+        'user': SubFactory(UserFactory),
+        'key': lambda n: f'key-{n}',
+        'request_hash': '0' * 64,
+    }
+
+
+class ArchivedOrderFactory(Factory):
+    model = ArchivedOrder
+    defaults = {
+        # Archived orders keep their Order id, far above the ids tests create
+        'id': lambda n: 10 ** 9 + n,
+        'customer': SubFactory(UserFactory),
+        'total_price': 10,
+        'status': 'delivered',
+        'created_at': lambda n: timezone.now(),
+        'updated_at': lambda n: timezone.now(),
+        'order_code': lambda n: code('A', n),
+    }
+
+
+class ArchivedOrderItemFactory(Factory):
+    model = ArchivedOrderItem
+    defaults = {
+        'id': lambda n: 10 ** 9 + n,
+        'order': SubFactory(ArchivedOrderFactory),
+        'product': SubFactory(ProductFactory),
+        'seller': Lazy(lambda row: row['product'].seller),
+        'quantity': 1,
+        'purchase_price': Lazy(lambda row: row['product'].price),
+    }
+
+
+class RelatedProductFactory(Factory):
+    model = RelatedProduct
+    defaults = {
+        'product': SubFactory(ProductFactory),
+        'related': SubFactory(ProductFactory),
+        'count': 1,
+        'score': 1.0,
+        'rank': 1,
+    }
+
+
+class RecommendationRunFactory(Factory):
+    model = RecommendationRun
+    defaults = {
+        'last_item_id': 0,
+    }
+
+
+class AbandonedCartFactory(Factory):
+    model = AbandonedCart
+    defaults = {
+        'user': SubFactory(UserFactory),
+        'cart_code': lambda n: code('C', n),
+        'item_count': 1,
+        'quantity': 1,
+        'total_price': 10,
+        'created_at': lambda n: timezone.now(),
+        'last_activity': lambda n: timezone.now(),
+    }
+
+
+class InventoryMovementFactory(Factory):
+    model = InventoryMovement
+    defaults = {
+        'inventory': SubFactory(SellerInventoryFactory),
+        'product': Lazy(lambda row: row['inventory'].product),
+        'change': 1,
+        'reason': 'adjustment',
+    }
+
+
+class InventorySnapshotFactory(Factory):
+    model = InventorySnapshot
+    defaults = {
+        'inventory': SubFactory(SellerInventoryFactory),
+        'stock_quantity': Lazy(lambda row: row['inventory'].stock_quantity),
+        'last_movement_id': 0,
+        'taken_at': lambda n: timezone.now(),
+    }
@@ -0,0 +1,62 @@
+from django.contrib import admin
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from .base import TestCase
+from .factories import (
+    UserFactory, SellerProfileFactory, ProductFactory, SellerInventoryFactory, CartItemFactory,
+    OrderItemFactory, DeliveryFactory, NotificationFactory,
+)
+
+
+class AdminChangelistQueryTests(TestCase):
+    """Every admin changelist runs a fixed number of queries, however many rows the table has"""
+
+    # Session, user, count and results plus the odd related lookup
+    MAX_QUERIES = 6
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserFactory.create_superuser(username='admin')
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.admin)
+
+    def create_rows(self, n):
+        """n rows for every model registered in the admin, each one pointing at different users/products"""
+        profiles = SellerProfileFactory.create_batch(n)
+        products = [ProductFactory.create(seller=profile.user) for profile in profiles]
+        for profile, product in zip(profiles, products):
+            SellerInventoryFactory.create(product=product, profile=profile, stock_quantity=5)
+        CartItemFactory.create_batch(n)
+        items = OrderItemFactory.create_batch(n)
+        DeliveryFactory.create_batch(n)
+        NotificationFactory.create_batch(n)
+        return products, items
+
+    def changelist_queries(self, model, query=''):
+        url = reverse(f'admin:{model._meta.app_label}_{model._meta.model_name}_changelist') + query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        models = [model for model in admin.site._registry if model._meta.app_label == 'api']
+        self.create_rows(2)
+        few = {model: self.changelist_queries(model) for model in models}
+        self.create_rows(10)
+        for model in models:
+            with self.subTest(model=model.__name__):
+                queries = self.changelist_queries(model)
+                self.assertEqual(queries, few[model])
+                self.assertLessEqual(queries, self.MAX_QUERIES)
+
+    def test_input_filter(self):
+        products, _ = self.create_rows(3)
+        url = reverse('admin:api_product_changelist')
+        response = self.client.get(url, {'seller__username': products[1].seller.username})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([product.name for product in response.context['cl'].result_list], [products[1].name])
+        self.assertContains(response, f'name="seller__username" value="{products[1].seller.username}"')
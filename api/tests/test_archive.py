@@ -0,0 +1,47 @@
+from datetime import timedelta
+from unittest import mock
+from django.utils import timezone
+from rest_framework.pagination import LimitOffsetPagination
+from ..models import Order
+from ..views import OrderView
+from .base import TestCase
+from .factories import ArchivedOrderFactory, OrderFactory, UserFactory
+
+
+class ArchivedOrderListTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = UserFactory.create()
+        now = timezone.now()
+        # Live and archived orders alternate by age, oldest first
+        cls.ids = []
+        for days in range(6, 0, -1):
+            created_at = now - timedelta(days=days)
+            if days % 2:
+                order = OrderFactory.create(customer=cls.customer)
+                Order.objects.filter(pk=order.pk).update(created_at=created_at)
+            else:
+                order = ArchivedOrderFactory.create(customer=cls.customer, created_at=created_at)
+            cls.ids.append(order.pk)
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+
+    def list_ids(self, **params):
+        response = self.client.get('/api/order/', {'include_archived': 1, **params})
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()]
+
+    def test_tiers_are_merged_in_order(self):
+        self.assertEqual(self.list_ids(ordering='created_at'), self.ids)
+        self.assertEqual(self.list_ids(ordering='-created_at'), self.ids[::-1])
+
+    def test_page_spans_both_tiers(self):
+        with mock.patch.object(OrderView, 'pagination_class', LimitOffsetPagination):
+            response = self.client.get(
+                '/api/order/', {'include_archived': 1, 'ordering': '-created_at', 'limit': 3, 'offset': 2},
+            )
+        data = response.json()
+        self.assertEqual(data['count'], 6)
+        self.assertEqual([row['id'] for row in data['results']], self.ids[::-1][2:5])
@@ -0,0 +1,48 @@
+from unittest import mock
+from django.db import transaction
+from .. import autocomplete
+from ..models import Product
+from .base import TestCase
+from .factories import CategoryFactory, UserFactory
+
+
+class AutocompleteIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.category = CategoryFactory.create(name='Kitchen')
+        cls.seller = UserFactory.create(role='seller')
+
+    def create_product(self, name):
+        return Product.objects.create(name=name, description='', price=10, category=self.category, seller=self.seller)
+
+    def search(self, query):
+        return [name for _, name, _ in autocomplete.get_index().search(query, 10)]
+
+    def test_saved_product_is_indexed_on_commit(self):
+        autocomplete.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.create_product('Teapot')
+        self.assertEqual(self.search('tea'), ['Teapot'])
+
+    def test_rolled_back_save_is_not_indexed(self):
+        autocomplete.get_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                self.create_product('Teapot')
+                transaction.set_rollback(True)
+        self.assertEqual(self.search('tea'), [])
+
+    def test_changes_during_a_rebuild_are_kept(self):
+        autocomplete.get_index()
+        load_index = autocomplete.load_index
+
+        def load_then_save():
+            # The product is saved after the rebuild read the table but before it is swapped in
+            index = load_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.create_product('Teapot')
+            return index
+
+        with mock.patch.object(autocomplete, 'load_index', load_then_save):
+            autocomplete._build()
+        self.assertEqual(self.search('tea'), ['Teapot'])
@@ -0,0 +1,20 @@
+from unittest import skipUnless
+from django.http import HttpResponse, JsonResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from ..middleware import CompressionMiddleware, brotli
+
+
+@override_settings(COMPRESSION_MIN_SIZE=100)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def compress(self, response):
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip, br')
+        return CompressionMiddleware(lambda request: response)(request)
+
+    def test_html_is_gzipped_not_brotli(self):
+        response = self.compress(HttpResponse('<input name="csrfmiddlewaretoken" value="secret">' * 50))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    @skipUnless(brotli, 'brotli is not installed')
+    def test_json_is_brotli(self):
+        response = self.compress(JsonResponse({'products': ['x' * 20] * 50}))
+        self.assertEqual(response['Content-Encoding'], 'br')
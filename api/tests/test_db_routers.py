@@ -0,0 +1,39 @@
+from base64 import b64encode
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from rest_framework.authentication import BasicAuthentication
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from ..db_routers import RequestRoutingState, _pin_key
+from .base import TestCase
+from .factories import PASSWORD, UserFactory
+
+
+class ReplicaPinningTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = UserFactory.create()
+
+    def basic_auth_request(self):
+        """A GET as the middleware sees it: anonymous until DRF authenticates the header"""
+        credentials = b64encode(f'{self.user.username}:{PASSWORD}'.encode()).decode()
+        request = APIRequestFactory().get('/api/order/', HTTP_AUTHORIZATION=f'Basic {credentials}')
+        request.user = AnonymousUser()
+        return request
+
+    def test_pin_is_checked_once_drf_authenticates(self):
+        request = self.basic_auth_request()
+        state = RequestRoutingState(request)
+        # Read before authentication (e.g. by a permission or throttle lookup)
+        self.assertTrue(state.replica_allowed())
+
+        cache.set(_pin_key(self.user.pk), 1)
+        drf_request = Request(request, authenticators=[BasicAuthentication()])
+        self.assertEqual(drf_request.user, self.user)
+        self.assertFalse(state.replica_allowed())
+
+    def test_unpinned_user_reads_from_replica(self):
+        request = self.basic_auth_request()
+        state = RequestRoutingState(request)
+        Request(request, authenticators=[BasicAuthentication()]).user
+        self.assertTrue(state.replica_allowed())
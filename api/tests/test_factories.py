@@ -0,0 +1,32 @@
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from . import factories
+from .base import TestCase
+from .factories import Factory, ProductFactory, SellerInventoryFactory
+
+
+class FactoryTests(TestCase):
+    def test_every_model_has_a_factory(self):
+        covered = {
+            factory.model for factory in vars(factories).values()
+            if isinstance(factory, type) and issubclass(factory, Factory) and factory.model
+        }
+        for model in apps.get_app_config('api').get_models():
+            with self.subTest(model=model.__name__):
+                self.assertIn(model, covered)
+                factory = next(f for f in vars(factories).values() if getattr(f, 'model', None) is model)
+                self.assertEqual(len(factory.create_batch(3)), 3)
+                self.assertGreaterEqual(model.objects.count(), 3)
+
+    def test_batch_is_one_insert_per_model(self):
+        with CaptureQueriesContext(connection) as queries:
+            ProductFactory.create_batch(50)
+        # Categories, sellers and products (bigger batches are split to SQLite's variable limit)
+        self.assertEqual(len(queries), 3)
+
+    def test_inventory_updates_product_stock(self):
+        inventory = SellerInventoryFactory.create(stock_quantity=7)
+        inventory.product.refresh_from_db()
+        self.assertEqual(inventory.product.total_stock, 7)
+        self.assertTrue(inventory.product.is_available)
@@ -0,0 +1,31 @@
+from ..popularity import record_sales
+from .base import TestCase
+from .factories import Each, ProductFactory
+
+
+class ProductOrderingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = ProductFactory.create_batch(3, price=Each([20, 10, 30]))
+        record_sales({cls.products[0].pk: 5, cls.products[1].pk: 1, cls.products[2].pk: 3})
+
+    def ordered(self, ordering):
+        response = self.client.get('/api/product/', {'ordering': ordering})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [row['id'] for row in response.json()]
+
+    def test_popularity_both_ways(self):
+        first, second, third = [p.pk for p in self.products]
+        self.assertEqual(self.ordered('popularity'), [first, third, second])
+        self.assertEqual(self.ordered('-popularity'), [second, third, first])
+
+    def test_aliases_mix_with_fields(self):
+        first, second, third = [p.pk for p in self.products]
+        self.assertEqual(self.ordered('-price,popularity'), [third, first, second])
+
+    def test_unknown_field_is_rejected(self):
+        for ordering in ('name', '-popular', 'price,nope'):
+            with self.subTest(ordering=ordering):
+                response = self.client.get('/api/product/', {'ordering': ordering})
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('ordering', response.json())
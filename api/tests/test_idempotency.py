@@ -0,0 +1,79 @@
+from datetime import timedelta
+from unittest import mock
+from django.db import OperationalError
+from django.test import override_settings
+from django.utils import timezone
+from .. import views
+from ..models import IdempotencyKey, Order
+from .base import TestCase
+from .factories import CartFactory, CartItemFactory, IdempotencyKeyFactory, SellerInventoryFactory, UserFactory
+
+
+@override_settings(IDEMPOTENCY_WAIT_SECONDS=0, IDEMPOTENCY_INFLIGHT_TIMEOUT=60)
+class IdempotencyKeyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = UserFactory.create()
+        cls.product = SellerInventoryFactory.create().product
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_login(self.customer)
+
+    def add_to_cart(self, key='retry-me'):
+        return self.client.post(
+            '/api/cart/add-to-cart/', {'product_code': self.product.product_code, 'quantity': 1},
+            content_type='application/json', headers={'Idempotency-Key': key},
+        )
+
+    def unfinished_key(self, age):
+        record = IdempotencyKeyFactory.create(user=self.customer, key='retry-me')
+        IdempotencyKey.objects.filter(pk=record.pk).update(created_at=timezone.now() - age)
+
+    def test_duplicate_is_replayed(self):
+        first = self.add_to_cart()
+        second = self.add_to_cart()
+        self.assertEqual(second.status_code, first.status_code)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second.headers['Idempotent-Replayed'], 'true')
+
+    def test_request_in_flight_conflicts(self):
+        self.unfinished_key(timedelta(seconds=5))
+        self.assertEqual(self.add_to_cart().status_code, 409)
+
+    def test_abandoned_request_can_be_retried(self):
+        self.unfinished_key(timedelta(seconds=61))
+        response = self.add_to_cart()
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(IdempotencyKey.objects.get(user=self.customer, key='retry-me').status_code)
+
+    def checkout(self, key='retry-me'):
+        return self.client.post('/api/cart/checkout/', headers={'Idempotency-Key': key})
+
+    def test_failed_checkout_can_be_retried(self):
+        CartItemFactory.create(cart=CartFactory.create(user=self.customer), product=self.product, quantity=1)
+        record_sales = views.record_sales
+        calls = []
+
+        def deadlock_once(*args, **kwargs):
+            calls.append(args)
+            if len(calls) == 1:
+                raise OperationalError('deadlock detected')
+            return record_sales(*args, **kwargs)
+
+        self.client.raise_request_exception = False
+        with mock.patch.object(views, 'record_sales', side_effect=deadlock_once):
+            self.assertEqual(self.checkout().status_code, 500)
+            self.assertFalse(Order.objects.exists())
+            response = self.checkout()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['message'], 'Checkout successful')
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_business_error_is_not_replayed(self):
+        cart = CartFactory.create(user=self.customer)
+        self.assertEqual(self.checkout().status_code, 400)
+        CartItemFactory.create(cart=cart, product=self.product, quantity=1)
+        response = self.checkout()
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Idempotent-Replayed', response.headers)
@@ -0,0 +1,40 @@
+from ..inventory import adjust_stock, apply_stock_deltas, reconcile_products, set_availability
+from ..models import Product, SellerInventory
+from .base import TestCase
+from .factories import ProductFactory, SellerInventoryFactory
+
+
+class AvailabilityTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.inventory = SellerInventoryFactory.create(stock_quantity=5)
+        self.product = self.inventory.product
+
+    def state(self):
+        self.product.refresh_from_db()
+        return self.product.listed, self.product.is_available
+
+    def test_off_sale_survives_stock_changes(self):
+        set_availability(Product.objects.filter(pk=self.product.pk), False)
+        self.assertEqual(self.state(), (False, False))
+
+        adjust_stock(SellerInventory.objects.filter(pk=self.inventory.pk), 'add', 3)
+        apply_stock_deltas({self.product.pk: 1})
+        SellerInventoryFactory.create(product=self.product)
+        reconcile_products()
+        self.assertEqual(self.state(), (False, False))
+
+    def test_listed_without_stock_goes_on_sale_when_restocked(self):
+        product = ProductFactory.create()
+        set_availability(Product.objects.filter(pk=product.pk), True)
+        product.refresh_from_db()
+        self.assertEqual((product.listed, product.is_available), (True, False))
+
+        SellerInventoryFactory.create(product=product, stock_quantity=2)
+        product.refresh_from_db()
+        self.assertTrue(product.is_available)
+
+    def test_reconcile_fixes_listed_products_only(self):
+        Product.objects.filter(pk=self.product.pk).update(is_available=False)
+        self.assertEqual(reconcile_products(), 1)
+        self.assertEqual(self.state(), (True, True))
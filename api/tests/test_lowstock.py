@@ -0,0 +1,45 @@
+from unittest import mock
+from django.utils import timezone
+from .. import lowstock
+from ..inventory import adjust_stock
+from ..models import Notification, SellerInventory
+from ..offers import decrement_stock
+from .base import TestCase
+from .factories import SellerInventoryFactory
+
+
+def sale(inventory, quantity):
+    return {'inventory_id': inventory.pk, 'product_id': inventory.product_id, 'quantity': quantity}
+
+
+class LowStockTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        self.rows = SellerInventoryFactory.create_batch(2, stock_quantity=10, reorder_threshold=3)
+
+    def notified(self):
+        return list(Notification.objects.order_by('id').values_list('user_id', flat=True))
+
+    def test_crossing_the_threshold_notifies_once(self):
+        row = self.rows[0]
+        decrement_stock([sale(row, 7)])
+        decrement_stock([sale(row, 1)])
+        self.assertEqual(self.notified(), [row.seller_id])
+        # Back above the threshold and down again is a new alert
+        adjust_stock(SellerInventory.objects.filter(pk=row.pk), 'add', 5)
+        decrement_stock([sale(row, 5)])
+        self.assertEqual(self.notified(), [row.seller_id, row.seller_id])
+
+    def test_rows_flagged_elsewhere_at_the_same_instant_are_not_claimed(self):
+        flagged, crossing = self.rows
+        now = timezone.now()
+        # Flagged by a concurrent checkout that committed within the same clock tick
+        SellerInventory.objects.filter(pk=flagged.pk).update(stock_quantity=2, low_stock_alerted_at=now)
+        with mock.patch.object(lowstock.timezone, 'now', return_value=now):
+            decrement_stock([sale(flagged, 1), sale(crossing, 8)])
+        self.assertEqual(self.notified(), [crossing.seller_id])
+
+    def test_backends_without_returning(self):
+        features = lowstock.connections['default'].features
+        with mock.patch.object(features, 'can_return_columns_from_insert', False):
+            self.test_rows_flagged_elsewhere_at_the_same_instant_are_not_claimed()
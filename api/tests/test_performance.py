@@ -0,0 +1,124 @@
+"""
+Performance regression tier: the key endpoints must stay within a query count and a
+latency budget on a catalog of a realistic size. Tagged 'performance', so
+
+    python manage.py test api --tag performance           # only these
+    python manage.py test api --exclude-tag performance   # everything else
+
+The latency budgets are generous medians for a development machine, scale them with
+PERFORMANCE_BUDGET_FACTOR (project/settings_test.py) where the hardware is slower.
+"""
+import time
+from statistics import median
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.test import tag
+from django.test.utils import CaptureQueriesContext
+from .base import TestCase
+from .factories import (
+    Each, SubFactory, UserFactory, CategoryFactory, ProductFactory, SellerInventoryFactory, CartFactory,
+    CartItemFactory, OrderFactory, OrderItemFactory,
+)
+
+
+@tag('performance')
+class EndpointBudgetTests(TestCase):
+    CATEGORIES = 10
+    PRODUCTS = 500
+    CART_ITEMS = 10
+    # Requests timed per endpoint, the median is checked against the budget
+    RUNS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.customer = UserFactory.create()
+        cls.seller = UserFactory.create(role='seller')
+        cls.products = ProductFactory.create_batch(
+            cls.PRODUCTS,
+            category=Each(CategoryFactory.create_batch(cls.CATEGORIES)),
+            seller=cls.seller,
+            price=Each([5, 20, 40, 80, 150, 300, 700, 1200]),
+        )
+        # Every product is stocked by its seller and one other
+        SellerInventoryFactory.create_batch(cls.PRODUCTS, product=Each(cls.products))
+        SellerInventoryFactory.create_batch(
+            cls.PRODUCTS, product=Each(cls.products), seller=SubFactory(UserFactory, role='seller'),
+        )
+        cls.cart = CartFactory.create(user=cls.customer)
+        OrderItemFactory.create_batch(
+            20, order=SubFactory(OrderFactory, customer=cls.customer), product=Each(cls.products),
+        )
+
+    def measure(self, request, prepare=None):
+        """
+        Run `request` RUNS times on empty caches, each run rolled back, and return
+        (most queries of a run, median ms, last response)
+        """
+        counts, timings = [], []
+        for _ in range(self.RUNS):
+            for cache in caches.all():
+                cache.clear()
+            with transaction.atomic():
+                if prepare:
+                    prepare()
+                with CaptureQueriesContext(connection) as queries:
+                    start = time.perf_counter()
+                    response = request()
+                    timings.append((time.perf_counter() - start) * 1000)
+                counts.append(len(queries))
+                transaction.set_rollback(True)
+        return max(counts), median(timings), response
+
+    def assertWithinBudget(self, request, max_queries, max_ms, prepare=None, status=200):
+        queries, ms, response = self.measure(request, prepare)
+        self.assertEqual(response.status_code, status, getattr(response, 'data', response))
+        budget_ms = max_ms * getattr(settings, 'PERFORMANCE_BUDGET_FACTOR', 1)
+        self.assertLessEqual(queries, max_queries, f'{queries} queries, budget is {max_queries}')
+        self.assertLessEqual(ms, budget_ms, f'median {ms:.1f} ms, budget is {budget_ms:.1f} ms')
+        return response
+
+    def fill_cart(self):
+        CartItemFactory.create_batch(self.CART_ITEMS, cart=self.cart, product=Each(self.products))
+
+    # Query budgets are what the endpoints run today, including the session and user
+    # lookups of logged in requests. None of them may grow with the number of rows.
+
+    def test_product_list(self):
+        self.assertWithinBudget(lambda: self.client.get('/api/product/'), 1, 100)
+
+    def test_product_list_filtered(self):
+        self.assertWithinBudget(lambda: self.client.get('/api/product/', {'price_min': 50, 'ordering': '-price'}), 1, 100)
+
+    def test_product_facets(self):
+        self.assertWithinBudget(lambda: self.client.get('/api/product/facets/'), 1, 25)
+
+    def test_product_autocomplete(self):
+        # Includes building the index, which the first search of a process does
+        response = self.assertWithinBudget(lambda: self.client.get('/api/product/autocomplete/', {'q': 'prod'}), 1, 25)
+        self.assertEqual(len(response.data), settings.AUTOCOMPLETE_LIMIT)
+
+    def test_seller_inventory_list(self):
+        self.client.force_login(self.seller)
+        self.assertWithinBudget(lambda: self.client.get('/api/seller_inventory/'), 3, 150)
+
+    def test_order_list(self):
+        self.client.force_login(self.customer)
+        self.assertWithinBudget(lambda: self.client.get('/api/order/'), 5, 40)
+
+    def test_cart_list(self):
+        self.client.force_login(self.customer)
+        self.assertWithinBudget(lambda: self.client.get('/api/cart/'), 5, 25, prepare=self.fill_cart)
+
+    def test_add_to_cart(self):
+        self.client.force_login(self.customer)
+        product = self.products[0]
+        self.assertWithinBudget(
+            lambda: self.client.post('/api/cart/add-to-cart/', {'product_code': product.product_code, 'quantity': 2}),
+            11, 30,
+        )
+
+    def test_checkout(self):
+        self.client.force_login(self.customer)
+        response = self.assertWithinBudget(lambda: self.client.post('/api/cart/checkout/'), 17, 75, prepare=self.fill_cart)
+        self.assertEqual(response.data['message'], 'Checkout successful')
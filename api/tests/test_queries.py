@@ -0,0 +1,49 @@
+from ..models import CartItem
+from ..querylog import assert_max_duplicate_queries
+from .base import TestCase
+from .factories import (
+    UserFactory, CategoryFactory, SellerProfileFactory, ProductFactory, SellerInventoryFactory,
+    CartItemFactory, OrderFactory, OrderItemFactory, DeliveryFactory, NotificationFactory,
+)
+
+
+class DuplicateQueryTests(TestCase):
+    """List endpoints run the same queries however many rows they return (no N+1)"""
+
+    ROWS = 5
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = UserFactory.create_superuser(username='admin')
+        cls.customer = UserFactory.create(username='customer')
+        category = CategoryFactory.create()
+        profiles = SellerProfileFactory.create_batch(cls.ROWS)
+        for profile in profiles:
+            product = ProductFactory.create(category=category, seller=profile.user)
+            SellerInventoryFactory.create(product=product, profile=profile, stock_quantity=5)
+            CartItemFactory.create(product=product)
+            OrderItemFactory.create(order=OrderFactory.create(customer=cls.customer), product=product)
+        cls.cart_owner = CartItemFactory.create().cart.user
+        DeliveryFactory.create_batch(cls.ROWS, delivery_person=cls.admin)
+        NotificationFactory.create_batch(cls.ROWS, user=cls.admin)
+
+    def test_list_endpoints(self):
+        self.client.force_login(self.admin)
+        for path in [
+            '/api/product/', '/api/seller_profile/', '/api/seller_inventory/', '/api/category/',
+            '/api/order/', '/api/delivery/', '/api/notification/',
+        ]:
+            with self.subTest(path=path), assert_max_duplicate_queries():
+                response = self.client.get(path)
+                self.assertEqual(response.status_code, 200)
+
+    def test_cart_list(self):
+        self.client.force_login(self.cart_owner)
+        with assert_max_duplicate_queries():
+            response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_detects_n_plus_one(self):
+        with self.assertRaisesMessage(AssertionError, 'Repeated queries'):
+            with assert_max_duplicate_queries():
+                [item.product.name for item in CartItem.objects.all()]
@@ -0,0 +1,32 @@
+from collections import Counter
+from unittest import mock, skipIf
+from django.test import SimpleTestCase
+from .. import recommendations
+from ..recommendations import CoOccurrence
+
+BIG = 2 ** 40
+# (order_id, product_id), ids on both sides of 2**32
+CHUNK = [
+    (1, BIG + 1), (1, BIG + 2), (1, 7),
+    (2, BIG + 1), (2, 7),
+    (3, BIG + 2), (3, 2 ** 32 + 2), (3, 7),
+]
+
+
+def related(matrix):
+    orders = Counter(product for _, product in set(CHUNK))
+    return [row[:3] + (round(row[3], 6),) + row[4:] for row in matrix.top(3, orders)]
+
+
+@skipIf(recommendations.np is None, 'numpy is not installed')
+class CoOccurrenceTests(SimpleTestCase):
+    def test_large_ids_match_plain_python(self):
+        vectorized = CoOccurrence(max_order_size=10)
+        vectorized.add(CHUNK)
+        with mock.patch.object(recommendations, 'np', None):
+            plain = CoOccurrence(max_order_size=10)
+            plain.add(CHUNK)
+            expected = related(plain)
+        self.assertEqual(related(vectorized), expected)
+        # Ids that would overflow or share their low 32 bits when packed into one int64
+        self.assertIn((BIG + 2, 2 ** 32 + 2, 1), [row[:3] for row in expected])
@@ -0,0 +1,58 @@
+import json
+import sys
+from unittest import mock
+from rest_framework.schemas.inspectors import DefaultSchema
+from rest_framework.views import APIView
+from ..lazy import LazySchema, LazySchemaMixin
+from ..schema import generate_schema
+from ..views import ProductView
+from .base import TestCase
+
+
+class LazySchemaTests(TestCase):
+    def test_generated_schema_is_unchanged(self):
+        lazy = json.dumps(generate_schema(), sort_keys=True, default=str)
+        with mock.patch.object(LazySchemaMixin, 'schema', DefaultSchema()):
+            eager = json.dumps(generate_schema(), sort_keys=True, default=str)
+        self.assertEqual(lazy, eager)
+
+    def test_class_access_skips_the_import(self):
+        with mock.patch.dict(sys.modules):
+            sys.modules.pop('drf_spectacular.openapi', None)
+            self.assertIsInstance(ProductView.schema, LazySchema)
+        self.assertNotIsInstance(ProductView().schema, LazySchema)
+
+    def test_other_views_are_left_alone(self):
+        self.assertNotIsInstance(APIView.schema, LazySchema)
+
+
+class SchemaRevalidationTests(TestCase):
+    def revalidate(self, **params):
+        first = self.client.get('/api/schema/', params, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(first['Content-Encoding'], 'gzip')
+        # Compressed, so the client holds a weak ETag
+        self.assertTrue(first['ETag'].startswith('W/"'))
+        return first['ETag']
+
+    def test_weak_etag_gets_304(self):
+        etag = self.revalidate()
+        response = self.client.get('/api/schema/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_json_format_gets_304(self):
+        etag = self.revalidate(format='json')
+        response = self.client.get(
+            '/api/schema/', {'format': 'json'}, headers={'Accept-Encoding': 'gzip', 'If-None-Match': etag},
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_etag_lists_and_wildcard(self):
+        etag = self.revalidate()
+        for header in (f'"stale", {etag}', '*'):
+            with self.subTest(header=header):
+                response = self.client.get('/api/schema/', headers={'If-None-Match': header})
+                self.assertEqual(response.status_code, 304)
+        response = self.client.get('/api/schema/', headers={'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,68 @@
+from django.test import override_settings
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.viewsets import ViewSet
+from ..inventory import apply_stock_deltas, set_availability
+from ..models import Product
+from ..popularity import record_sales
+from ..singleflight import SingleFlightMixin, catalog_version
+from .base import TestCase
+from .factories import ProductFactory, SellerInventoryFactory
+
+
+class BaseView(ViewSet):
+    calls = 0
+
+    def list(self, request):
+        BaseView.calls += 1
+        return Response({'calls': BaseView.calls}, status=203, headers={'X-Catalog': 'yes'})
+
+
+class CachedView(SingleFlightMixin, BaseView):
+    pass
+
+
+class SingleFlightTests(TestCase):
+    def test_replays_status_and_headers(self):
+        view = CachedView.as_view({'get': 'list'})
+        first = view(APIRequestFactory().get('/catalog/'))
+        second = view(APIRequestFactory().get('/catalog/'))
+        for response in (first, second):
+            self.assertEqual(response.status_code, 203)
+            self.assertEqual(response['X-Catalog'], 'yes')
+            self.assertEqual(response.data, {'calls': 1})
+
+    def test_version_is_bumped_on_commit(self):
+        product = ProductFactory.create()
+        version = catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            set_availability(Product.objects.filter(pk=product.pk), False)
+            # A read before the commit must not cache the old row under a new version
+            self.assertEqual(catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(catalog_version(), version)
+
+    def test_selling_out_invalidates_product_list(self):
+        product = SellerInventoryFactory.create(stock_quantity=5).product
+        self.assertTrue(self.client.get('/api/product/').json()[0]['is_available'])
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({product.pk: -5})
+        self.assertFalse(self.client.get('/api/product/').json()[0]['is_available'])
+
+    def test_sales_keep_the_cache(self):
+        product = SellerInventoryFactory.create(stock_quantity=5).product
+        version = catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            apply_stock_deltas({product.pk: -2})
+            record_sales({product.pk: 2})
+        self.assertEqual(catalog_version(), version)
+
+    @override_settings(SINGLEFLIGHT_TTL=0)
+    def test_sales_show_up_once_the_cache_expires(self):
+        first, second = [inventory.product.pk for inventory in SellerInventoryFactory.create_batch(2)]
+        record_sales({first: 1})
+        popular = lambda: [row['id'] for row in self.client.get('/api/product/', {'ordering': 'popularity'}).json()]
+        self.assertEqual(popular(), [first, second])
+        record_sales({second: 5})
+        self.assertEqual(popular(), [second, first])
@@ -0,0 +1,87 @@
+from unittest import mock
+from django.core.cache import cache
+from django.test import override_settings
+from .. import throttling
+from ..throttling import CacheBucketStore, LocalBucketStore
+from .base import TestCase
+from .factories import UserFactory
+
+# One token every 30 seconds
+TWO_PER_MINUTE = (2, 2 / 60)
+
+
+class BucketStoreTests(TestCase):
+    def stores(self):
+        for store in (LocalBucketStore(max_size=10), CacheBucketStore('default')):
+            with self.subTest(store=type(store).__name__):
+                cache.clear()
+                yield store
+
+    def test_bucket_runs_out_and_refills(self):
+        bucket = [('throttle:test', *TWO_PER_MINUTE)]
+        for store in self.stores():
+            self.assertEqual(store.consume(bucket, 1000), 0)
+            self.assertEqual(store.consume(bucket, 1000), 0)
+            self.assertAlmostEqual(store.consume(bucket, 1000), 30)
+            self.assertAlmostEqual(store.consume(bucket, 1020), 10)
+            self.assertEqual(store.consume(bucket, 1030), 0)
+
+    def test_denied_request_takes_no_token(self):
+        overall, endpoint = ('throttle:overall', 10, 1), ('throttle:endpoint', *TWO_PER_MINUTE)
+        for store in self.stores():
+            store.consume([endpoint], 1000)
+            store.consume([endpoint], 1000)
+            self.assertGreater(store.consume([overall, endpoint], 1000), 0)
+            # All ten overall tokens are still there
+            for _ in range(10):
+                self.assertEqual(store.consume([overall], 1000), 0)
+            self.assertGreater(store.consume([overall], 1000), 0)
+
+    def test_local_store_drops_least_recently_used(self):
+        store = LocalBucketStore(max_size=2)
+        for key in ('a', 'b', 'a', 'c'):
+            store.consume([(key, *TWO_PER_MINUTE)], 1000)
+        self.assertEqual(list(store._buckets), ['a', 'c'])
+
+
+@override_settings(
+    THROTTLE_ROLE_RATES={'anon': '3/min', 'customer': '10/min'},
+    THROTTLE_ENDPOINT_RATES={'product.list': {'anon': '2/min'}, 'category.list': '5/min'},
+)
+class RoleRateThrottleTests(TestCase):
+    def setUp(self):
+        super().setUp()
+        throttling._store = None
+        self.addCleanup(setattr, throttling, '_store', None)
+
+    def get(self, path, at=1000):
+        with mock.patch.object(throttling.time, 'time', return_value=at):
+            return self.client.get(path)
+
+    def test_endpoint_limit_sets_retry_after(self):
+        self.assertEqual(self.get('/api/product/').status_code, 200)
+        self.assertEqual(self.get('/api/product/').status_code, 200)
+        response = self.get('/api/product/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        # Refilled one token later
+        self.assertEqual(self.get('/api/product/', at=1030).status_code, 200)
+
+    def test_role_limit_covers_every_endpoint(self):
+        self.get('/api/product/')
+        self.get('/api/product/')
+        # Turned away by the product.list bucket without touching the overall one
+        self.assertEqual(self.get('/api/product/').status_code, 429)
+        self.assertEqual(self.get('/api/category/').status_code, 200)
+        response = self.get('/api/category/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '20')
+
+    def test_roles_have_their_own_buckets(self):
+        for _ in range(3):
+            self.get('/api/category/')
+        self.assertEqual(self.get('/api/category/').status_code, 429)
+        self.client.force_login(UserFactory.create())
+        for _ in range(5):
+            self.assertEqual(self.get('/api/category/').status_code, 200)
+        self.assertEqual(self.get('/api/category/').status_code, 429)
@@ -0,0 +1,134 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+@lru_cache(maxsize=None)
+def parse_rate(rate):
+    """'100/min' -> (bucket capacity, tokens added per second)"""
+    if rate is None:
+        return None
+    num, period = rate.split('/')
+    capacity = int(num)
+    return capacity, capacity / PERIODS[period[0]]
+
+
+def _take(buckets, stored, now):
+    """
+    Take a token from every bucket in `buckets` [(key, capacity, refill_rate)], whose
+    stored (tokens, timestamp) are in `stored`. Returns (0, {key: new state}), or the
+    seconds until all of them have a token and None, in which case none is taken.
+    """
+    tokens = {}
+    wait = 0
+    for key, capacity, refill_rate in buckets:
+        bucket = stored.get(key)
+        tokens[key] = capacity if bucket is None else min(capacity, bucket[0] + (now - bucket[1]) * refill_rate)
+        if tokens[key] < 1:
+            wait = max(wait, (1 - tokens[key]) / refill_rate)
+    if wait:
+        return wait, None
+    return 0, {key: (count - 1, now) for key, count in tokens.items()}
+
+
+class LocalBucketStore:
+    """Token buckets in process memory, the least recently used ones are dropped past max_size"""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, buckets, now):
+        """Take a token from each of `buckets` if all have one, returns 0 or the seconds until they do"""
+        with self._lock:
+            stored = {key: self._buckets[key] for key, _, _ in buckets if key in self._buckets}
+            wait, taken = _take(buckets, stored, now)
+            if taken is None:
+                return wait
+            for key, bucket in taken.items():
+                if key in self._buckets:
+                    self._buckets.move_to_end(key)
+                elif len(self._buckets) >= self.max_size:
+                    self._buckets.popitem(last=False)
+                self._buckets[key] = bucket
+            return 0
+
+
+class CacheBucketStore:
+    """
+    Token buckets in a Django cache shared by every worker. The read and write are
+    not atomic, so a burst across workers can let a few extra requests through.
+    """
+
+    def __init__(self, alias):
+        self.cache = caches[alias]
+
+    def consume(self, buckets, now):
+        wait, taken = _take(buckets, self.cache.get_many([key for key, _, _ in buckets]), now)
+        if taken is None:
+            return wait
+        for key, capacity, refill_rate in buckets:
+            # A bucket that has been idle long enough to refill completely can expire
+            self.cache.set(key, taken[key], timeout=int(capacity / refill_rate) + 1)
+        return 0
+
+
+_store = None
+
+
+def get_bucket_store():
+    global _store
+    if _store is None:
+        if settings.THROTTLE_CACHE:
+            _store = CacheBucketStore(settings.THROTTLE_CACHE)
+        else:
+            _store = LocalBucketStore(settings.THROTTLE_LOCAL_MAX_KEYS)
+    return _store
+
+
+class RoleRateThrottle(BaseThrottle):
+    """
+    Token bucket rate limiting by user role. Every client has a bucket sized by
+    THROTTLE_ROLE_RATES[role] that all endpoints draw from, and endpoints listed in
+    THROTTLE_ENDPOINT_RATES ('<basename>.<action>') get an extra bucket of their own.
+    Anonymous clients are keyed by IP under the 'anon' role.
+    """
+
+    def allow_request(self, request, view):
+        user = request.user
+        if user.is_authenticated:
+            role = 'admin' if user.is_staff else (user.role or 'customer')
+            ident = user.pk
+        else:
+            role = 'anon'
+            ident = self.get_ident(request)
+
+        buckets = []
+        rate = parse_rate(settings.THROTTLE_ROLE_RATES.get(role))
+        if rate is not None:
+            buckets.append((f'throttle:{role}:{ident}', *rate))
+
+        endpoint = f"{getattr(view, 'basename', view.__class__.__name__)}.{getattr(view, 'action', request.method.lower())}"
+        endpoint_rate = settings.THROTTLE_ENDPOINT_RATES.get(endpoint)
+        if isinstance(endpoint_rate, dict):
+            # Separate rates per role for this endpoint
+            endpoint_rate = endpoint_rate.get(role)
+        rate = parse_rate(endpoint_rate)
+        if rate is not None:
+            buckets.append((f'throttle:{endpoint}:{role}:{ident}', *rate))
+
+        # Both buckets are checked before either is drawn from, a request turned away
+        # by the endpoint limit doesn't use up the client's overall allowance
+        self.wait_time = get_bucket_store().consume(buckets, time.time()) if buckets else 0
+        return not self.wait_time
+
+    def wait(self):
+        # DRF turns this into the Retry-After header
+        return self.wait_time
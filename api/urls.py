@@ -1,5 +1,8 @@
 from django.urls import path, include
-from .views import *
+from .views import (
+    CartView, CategoryView, DeliveryView, NotificationView, OrderView, ProductView, SellerInventoryView,
+    SellerProfileView,
+)
 from rest_framework.routers import DefaultRouter
 
 # Creating Router
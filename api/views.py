@@ -1,39 +1,127 @@
 from django.shortcuts import render
-from .models import *
-from .serializers import *
+from .models import (
+    ArchivedOrder, Cart, CartItem, Category, Delivery, Notification, Order, OrderItem, Product,
+    RelatedProduct, SellerInventory, SellerProfile,
+)
+from .serializers import (
+    AddToCartSerializer, ArchivedOrderSerializer, BulkAvailabilitySerializer, BulkDeliveryStatusSerializer,
+    BulkStockAdjustSerializer, CartSerializer, CategorySerializer, DeliverySerializer, NotificationSerializer,
+    OrderSerializer, ProductSerializer, SellerInventorySerializer, SellerProfileSerializer,
+)
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, status
-from .permissions import *
+from .permissions import (
+    DeliveryPermission, IsAdmin, IsCustomer, IsSeller, IsSellerOrReadOnly, OrderPermission,
+    ProductOwnerOrReadOnly, ReadOnly,
+)
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAuthenticatedOrReadOnly
 from django.db import transaction
+from decimal import Decimal
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from .archive import merge_tiers
+from .dispatch import DELIVERY_STATUS_FIELDS, apply_delivery_status, split_transitions
+from .idempotency import idempotent
+from .singleflight import SingleFlightMixin
+from .filters import ProductFilter, ProductOrderingFilter
+from .popularity import record_sales
+from .inventory import apply_stock_deltas, bulk_adjust_stock, set_availability
+from .offers import allocation_total, decrement_stock, select_offers
+from django.db.models import F, Prefetch, Q
+from django_filters.rest_framework import DjangoFilterBackend
+from rest_framework.filters import OrderingFilter, SearchFilter
+from .facets import cached_facets
+from .autocomplete import get_index
+from .lazy import LazySchemaMixin
+from django.conf import settings
 
 
-class SellerProfileView(ModelViewSet):
-    queryset = SellerProfile.objects.all()
+class SellerProfileView(LazySchemaMixin, ModelViewSet):
+    # Every profile lists its seller's inventory (see SellerProfileSerializer.get_inventory)
+    queryset = SellerProfile.objects.select_related('user').prefetch_related(
+        Prefetch('user__sellerinventory_set', queryset=SellerInventory.objects.select_related('product', 'seller'))
+    )
     serializer_class = SellerProfileSerializer
     # Permissions
     permission_classes = [IsSellerOrReadOnly] # Everybody(including unauthenticated) can read, only seller can edit
 
-class CategoryView(ModelViewSet):
+class CategoryView(LazySchemaMixin, SingleFlightMixin, ModelViewSet):
     queryset = Category.objects.all()
     serializer_class = CategorySerializer
     # Filtering by name
     search_fields = ['name']
     permission_classes = [ReadOnly | IsAdmin] # Everybdoy can read, only admin can edit
 
-class ProductView(ModelViewSet):
-    queryset = Product.objects.all()
+class ProductView(LazySchemaMixin, SingleFlightMixin, ModelViewSet):
+    queryset = Product.objects.select_related('category')
     serializer_class = ProductSerializer
     # Filtering data
-    filterset_fields = ['category', 'price'] # Filter with values
+    filter_backends = [DjangoFilterBackend, SearchFilter, ProductOrderingFilter]
+    filterset_class = ProductFilter # Filter with values and price/date ranges
     search_fields = ['name', 'category__name']  # Filter by searching
-    ordering_fields = ['price', 'posted_at'] # Sort the filter
+    ordering_fields = ['price', 'posted_at', 'sales_count', 'trending_score', 'id'] # Sort the filter, also ?ordering=popularity/trending
     permission_classes = [ProductOwnerOrReadOnly]
+    lookup_value_regex = r'\d+'
 
-class SellerInventoryView(ModelViewSet):
-    queryset = SellerInventory.objects.all()
+    @action(detail=True, methods=['get'], url_path='related')
+    def related(self, request, pk=None):
+        """
+        Products most often bought together with this one (python manage.py compute_recommendations)
+        GET /api/product/{id}/related/
+        """
+        related = (
+            RelatedProduct.objects.filter(product_id=pk)
+            .select_related('related__category')
+            .order_by('rank')
+        )
+        return Response(ProductSerializer([row.related for row in related], many=True).data)
+
+    @action(detail=False, methods=['post'], url_path='bulk-availability', permission_classes=[IsSeller])
+    def bulk_availability(self, request):
+        """
+        Put many of the seller's products on or off sale, products without stock go on sale once restocked
+        POST /api/product/bulk-availability/
+        {
+            "ids": [1, 2, 3],
+            "is_available": false
+        }
+        """
+        serializer = BulkAvailabilitySerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        products = Product.objects.filter(seller=request.user, id__in=serializer.validated_data['ids'])
+        updated = set_availability(products, serializer.validated_data['is_available'])
+        return Response({"is_available": serializer.validated_data['is_available'], "updated": updated})
+
+    @action(detail=False, methods=['get'], url_path='facets')
+    def facets(self, request):
+        """
+        Category counts and price histogram for the products matching the current filters
+        GET /api/product/facets/?price_min=10&is_available=true
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(cached_facets(request, queryset))
+
+    @action(detail=False, methods=['get'], url_path='autocomplete')
+    def autocomplete(self, request):
+        """
+        Best selling products whose name, category or code starts with q
+        GET /api/product/autocomplete/?q=blu&limit=5
+        """
+        try:
+            limit = int(request.query_params.get('limit', settings.AUTOCOMPLETE_LIMIT))
+        except ValueError:
+            limit = settings.AUTOCOMPLETE_LIMIT
+        limit = max(1, min(limit, settings.AUTOCOMPLETE_MAX_LIMIT))
+        results = get_index().search(request.query_params.get('q', ''), limit)
+        return Response([{'id': pk, 'name': name, 'product_code': code} for pk, name, code in results])
+
+class SellerInventoryView(LazySchemaMixin, ModelViewSet):
+    queryset = SellerInventory.objects.select_related('product', 'seller')
     serializer_class = SellerInventorySerializer
     # Filtering
     filterset_fields = ['product__category', 'stock_quantity']
@@ -41,14 +129,79 @@ class SellerInventoryView(ModelViewSet):
     ordering_fields = ['stock_quantity']
     permission_classes = [IsAuthenticated, IsSellerOrReadOnly] # Everybody(excluding unauthorized) can view, but only seller can edit
 
+    # /api/seller_inventory/low-stock/
+    @action(detail=False, methods=['get'], url_path='low-stock', permission_classes=[IsSeller])
+    def low_stock(self, request):
+        """The seller's inventory rows at or below their reorder threshold, emptiest first"""
+        # Matches the condition of api_inventory_low_stock_idx so only that index is read
+        rows = (
+            SellerInventory.objects.filter(seller=request.user, stock_quantity__lte=F('reorder_threshold'))
+            .select_related('product', 'seller').order_by('stock_quantity', 'id')
+        )
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows, many=True).data)
 
-class CartView(ModelViewSet):
-    queryset = Cart.objects.all()
+    @action(detail=False, methods=['post'], url_path='bulk-adjust', permission_classes=[IsSeller])
+    @idempotent
+    def bulk_adjust(self, request):
+        """
+        Set, add to or subtract from the stock of many of the seller's inventory rows at once
+        POST /api/seller_inventory/bulk-adjust/
+        {
+            "operation": "add",
+            "items": [{"product_code": "ABC123", "quantity": 5}, {"id": 7, "quantity": 2}]
+        }
+        or multipart with "operation" and a CSV "file" (id or product_code, quantity)
+        """
+        serializer = BulkStockAdjustSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        operation = serializer.validated_data['operation']
+        items = serializer.validated_data['items']
+
+        # Resolve ids and product codes against this seller's inventory in one query
+        ids = {item['id'] for item in items if 'id' in item}
+        codes = {item['product_code'] for item in items if 'product_code' in item}
+        rows = SellerInventory.objects.filter(seller=request.user).filter(
+            Q(id__in=ids) | Q(product__product_code__in=codes)
+        ).values_list('id', 'product__product_code')
+        by_code = {}
+        found_ids = set()
+        for pk, code in rows:
+            found_ids.add(pk)
+            by_code.setdefault(code, []).append(pk)
+
+        adjustments = {}
+        not_found = []
+        for item in items:
+            targets = [item['id']] if item.get('id') in found_ids else by_code.get(item.get('product_code'), [])
+            if not targets:
+                not_found.append(item.get('id', item.get('product_code')))
+            for pk in targets:
+                # Repeated rows add up, except for "set" where the last one wins
+                previous = adjustments.get(pk, 0) if operation != 'set' else 0
+                adjustments[pk] = previous + item['quantity']
+
+        updated = bulk_adjust_stock(adjustments, operation) if adjustments else 0
+        return Response({
+            "operation": operation,
+            "updated": updated,
+            "not_found": not_found,
+        })
+
+
+class CartView(LazySchemaMixin, ModelViewSet):
+    queryset = Cart.objects.prefetch_related('cart_items__product')
     serializer_class = CartSerializer
     permission_classes = [IsAuthenticated, IsCustomer]
 
     # /api/cart/checkout
     @action(detail=False, methods=['post'], url_path='checkout')
+    @idempotent
     def checkout(self, request):
         """Checkout cart and create order"""
         try:
@@ -56,31 +209,28 @@ class CartView(ModelViewSet):
                 # 1. get users Cart
                 cart = Cart.objects.get(user=request.user)
                 # 2. get each item from the cart
-                cart_items = cart.cart_items.select_related('product').all()
+                cart_items = list(cart.cart_items.select_related('product'))
                 # 3. validate cart items
                 # check if there are items in the cart
-                if not cart_items.exists():
-                    return Response({"error": "Cart is empty"})
-                
-                # check if the stock is available
-                total_amount = 0
-                inventory_dict = {}
-                
+                if not cart_items:
+                    return Response({"error": "Cart is empty"}, status=400)
+
                 for item in cart_items:
-                    try:
-                        inventory = SellerInventory.objects.get(seller=item.product.seller, product=item.product)
-                        inventory_dict[item.product.id] = inventory
-                    except SellerInventory.DoesNotExist:
-                        return Response({"error": f"{item.product.name} is no longer available in inventory"})
-                    
                     if not item.product.is_available:
-                        return Response({"error": f"{item.product.name} is no longer available"})
-                    
-                    if inventory.stock_quantity < item.quantity:
-                        return Response({"error": f"Not enough stock for {item.product.name} stock left {inventory.stock_quantity}"})
-                    
-                    # calculate the total amount from the products
-                    total_amount += item.product.price * item.quantity
+                        return Response({"error": f"{item.product.name} is no longer available"}, status=400)
+
+                # check if the stock is available, picking sellers for every item (one locked query)
+                allocations, shortages = select_offers(
+                    [(item.product_id, item.quantity) for item in cart_items], lock=True
+                )
+                for item in cart_items:
+                    if item.product_id in shortages:
+                        if not shortages[item.product_id]:
+                            return Response({"error": f"{item.product.name} is no longer available in inventory"}, status=400)
+                        return Response({"error": f"Not enough stock for {item.product.name} stock left {shortages[item.product_id]}"}, status=400)
+
+                # calculate the total amount from the chosen sellers' prices
+                total_amount = sum(a['unit_price'] * a['quantity'] for a in allocations)
 
                 # 4. create the order
                 order = Order.objects.create(
@@ -88,26 +238,25 @@ class CartView(ModelViewSet):
                     total_price = total_amount,
                     status = 'pending',
                 )
-                # 5. convert cart items into orderitems
-                for cart_item in cart_items:
-                    inventory = inventory_dict[cart_item.product.id]
-                    
-                    OrderItem.objects.create(
+                # 5. convert cart items into orderitems, one per seller an item was filled from
+                OrderItem.objects.bulk_create([
+                    OrderItem(
                         order = order,
-                        product = cart_item.product,
-                        quantity = cart_item.quantity,
-                        purchase_price = cart_item.product.price
+                        product_id = a['product_id'],
+                        seller_id = a['seller_id'],
+                        quantity = a['quantity'],
+                        purchase_price = a['unit_price'],
                     )
+                    for a in allocations
+                ])
+
+                # Update seller inventory stock, products nobody has left go unavailable
+                decrement_stock(allocations, order=order)
+                apply_stock_deltas({item.product_id: -item.quantity for item in cart_items})
+
+                # Best seller/trending counters, one UPDATE for the whole order
+                record_sales({item.product_id: item.quantity for item in cart_items})
 
-                    # Update seller inventory stock
-                    inventory.stock_quantity -= cart_item.quantity
-                    inventory.save()
-                    
-                    # If stock reaches 0, mark product as unavailable
-                    if inventory.stock_quantity == 0:
-                        cart_item.product.is_available = False
-                        cart_item.product.save()
-                
                 # 6. Clear the cart after successful checkout
                 cart.cart_items.all().delete()
                 cart.total_price = 0.00
@@ -120,15 +269,16 @@ class CartView(ModelViewSet):
                     "total_amount": total_amount
                 })
 
+        # Anything else (a deadlock, a dropped connection) is left to raise as a 500,
+        # so a retry with the same Idempotency-Key runs the checkout again
         except Cart.DoesNotExist:
-            return Response({"error": "Cart not found"})
-        except  Exception as e:
-            return Response({"error": f"Checkout failed: {str(e)}"})
+            return Response({"error": "Cart not found"}, status=404)
         
     @action(detail=False, methods=['post'], url_path='add-to-cart')
+    @idempotent
     def add_to_cart(self, request):
         """
-        Add product to cart using product unique_code
+        Add product to cart using product_code
         POST /api/cart/add-to-cart/
         {
             "product_code": "ABC123",
@@ -138,14 +288,14 @@ class CartView(ModelViewSet):
         serializer = AddToCartSerializer(data=request.data)
 
         if not serializer.is_valid():
-            return Response(serializer.errors)
+            return Response(serializer.errors, status=400)
         
         product_code = serializer.validated_data['product_code']
         quantity = serializer.validated_data['quantity']
 
         try:
             with transaction.atomic():
-                product = Product.objects.get(unique_code=product_code)
+                product = Product.objects.get(product_code=product_code)
                 
                 # Check if user has cart, if not create a cart for user
                 try:
@@ -155,33 +305,29 @@ class CartView(ModelViewSet):
 
                 # Check if product is available
                 if not product.is_available:
-                    return Response({"error": f"{product.name} is not available"})
+                    return Response({"error": f"{product.name} is not available"}, status=400)
                 
-                # Check inventory stock
-                try:
-                    inventory = SellerInventory.objects.get(
-                        seller=product.seller,
-                        product=product
-                    )
-                    if inventory.stock_quantity < quantity:
+                # Check if product is already in cart
+                cart_item = CartItem.objects.filter(cart=cart, product=product).first()
+                in_cart = cart_item.quantity if cart_item else 0
+
+                # Check inventory stock across every seller of the product
+                allocations, shortages = select_offers([(product.id, in_cart + quantity)])
+                if product.id in shortages:
+                    stock_left = shortages[product.id]
+                    if not stock_left:
+                        return Response({
+                            "error": f"{product.name} is not available in inventory"
+                        }, status=400)
+                    if cart_item:
                         return Response({
-                            "error": f"{product.name} only has {inventory.stock_quantity} pieces left"
+                            "error": f"Cannot add {quantity} more. {product.name} only has {stock_left} pieces left"
                         }, status=400)
-                except SellerInventory.DoesNotExist:
                     return Response({
-                        "error": f"{product.name} is not available in inventory"
+                        "error": f"{product.name} only has {stock_left} pieces left"
                     }, status=400)
-                
-                # Check if product is already in cart
-                cart_item = CartItem.objects.filter(cart=cart, product=product).first()
-                
+
                 if cart_item:
-                    # Check total quantity after update
-                    if inventory.stock_quantity < (cart_item.quantity + quantity):
-                        return Response({
-                            "error": f"Cannot add {quantity} more. {product.name} only has {inventory.stock_quantity} pieces left"
-                        })
-                    
                     # Update the quantity
                     cart_item.quantity += quantity
                     cart_item.save()
@@ -195,8 +341,9 @@ class CartView(ModelViewSet):
                     )
                     message = "Added to cart successfully"
                 
-                # Update cart total price
-                cart.total_price += (product.price * quantity)
+                # Update cart total price (a new cart still holds the float default)
+                # The new units cost what the sellers after the ones filling the earlier units ask
+                cart.total_price = Decimal(cart.total_price) + allocation_total(allocations, skip=in_cart)
                 cart.save()
                 
                 return Response({
@@ -204,20 +351,18 @@ class CartView(ModelViewSet):
                     "message": message,
                     "cart_item_id": cart_item.id,
                     "product": product.name,
-                    "product_code": product.unique_code,
+                    "product_code": product.product_code,
                     "quantity": cart_item.quantity,
-                    "price_per_item": str(product.price),
-                    "total_for_item": str(product.price * cart_item.quantity),
+                    "price_per_item": str(allocations[0]['unit_price']),
+                    "total_for_item": str(allocation_total(allocations)),
                     "total_in_cart": cart.cart_items.count(),
                     "cart_total": str(cart.total_price)
                 })
 
         except Product.DoesNotExist:
-            return Response({"error": f"Product with code '{product_code}' does not exist"})
-        except Exception as e:
-            return Response({"error": f"Failed to add to cart: {str(e)}"})
+            return Response({"error": f"Product with code '{product_code}' does not exist"}, status=404)
     
-class OrderView(ModelViewSet):
+class OrderView(LazySchemaMixin, ModelViewSet):
     queryset = Order.objects.all()
     serializer_class = OrderSerializer
     # Filtering
@@ -229,32 +374,123 @@ class OrderView(ModelViewSet):
 
     def get_queryset(self):
         user = self.request.user
+        queryset = Order.objects.select_related('customer').prefetch_related('items__product')
         # Admins can see all orders
         if user.is_staff:
-            return Order.objects.all()
+            return queryset
         # Customers can only see their orders
-        return Order.objects.filter(customer=user)
-        
+        return queryset.filter(customer=user)
 
-class DeliveryView(ModelViewSet):
+    def get_archived_queryset(self):
+        user = self.request.user
+        queryset = ArchivedOrder.objects.select_related('customer').prefetch_related('items__product')
+        if user.is_staff:
+            return queryset
+        return queryset.filter(customer=user)
+
+    def include_archived(self):
+        # ?include_archived=1 reads the archive tier as well
+        return self.request.query_params.get('include_archived') in ('1', 'true', 'True')
+
+    def list(self, request, *args, **kwargs):
+        # Default listings only touch the hot tier
+        if not self.include_archived():
+            return super().list(request, *args, **kwargs)
+
+        # One list in ?ordering order (then id) across both tiers, pages can span them
+        orders = self.filter_queryset(self.get_queryset())
+        merged = merge_tiers(
+            orders, self.filter_queryset(self.get_archived_queryset()),
+            OrderingFilter().get_ordering(request, orders, self) or (),
+        )
+        page = self.paginate_queryset(merged)
+        rows = [
+            ArchivedOrderSerializer(order).data if isinstance(order, ArchivedOrder) else self.get_serializer(order).data
+            for order in (merged if page is None else page)
+        ]
+        if page is not None:
+            return self.get_paginated_response(rows)
+        return Response(rows)
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            if not self.include_archived():
+                raise
+        archived = get_object_or_404(self.get_archived_queryset(), pk=kwargs['pk'])
+        return Response(ArchivedOrderSerializer(archived).data)
+
+
+class DeliveryView(LazySchemaMixin, ModelViewSet):
     queryset = Delivery.objects.all()
     serializer_class = DeliverySerializer
     permission_classes = [IsAuthenticated, DeliveryPermission]
     def get_queryset(self):
         user = self.request.user
+        queryset = Delivery.objects.select_related('delivery_person')
         if user.role == 'admin':
-            return Delivery.objects.all()
+            return queryset
         # Delivery personnel can only see their own deliveries
-        return Delivery.objects.filter(delivery_person=user)
+        return queryset.filter(delivery_person=user)
+
+    def perform_update(self, serializer):
+        # Status changes go through apply_delivery_status so the order is kept in sync
+        new_status = serializer.validated_data.pop('status', None)
+        delivery = serializer.save()
+        if new_status and new_status != delivery.status:
+            row = Delivery.objects.filter(pk=delivery.pk).values(*DELIVERY_STATUS_FIELDS).get()
+            apply_delivery_status([row], new_status)
+            delivery.refresh_from_db()
+
+    @action(detail=False, methods=['post'], url_path='bulk-status')
+    @idempotent
+    def bulk_status(self, request):
+        """
+        Move many deliveries and their orders to a new status at once
+        POST /api/delivery/bulk-status/
+        {
+            "ids": [1, 2, 3],
+            "status": "delivered"
+        }
+        """
+        serializer = BulkDeliveryStatusSerializer(data=request.data)
+
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=400)
+
+        ids = serializer.validated_data['ids']
+        new_status = serializer.validated_data['status']
+
+        with transaction.atomic():
+            # Only the deliveries this user can see, locked until the updates are done
+            deliveries = list(
+                self.get_queryset().select_for_update(of=('self',))
+                .filter(id__in=ids)
+                .values(*DELIVERY_STATUS_FIELDS)
+            )
+            allowed, rejected = split_transitions(deliveries, new_status)
+            apply_delivery_status(allowed, new_status)
+
+        found = {d['id'] for d in deliveries}
+        return Response({
+            "status": new_status,
+            "updated": [d['id'] for d in allowed],
+            "rejected": [
+                {"id": d['id'], "error": f"Cannot change status from {d['status']} to {new_status}"}
+                for d in rejected
+            ],
+            "not_found": [pk for pk in ids if pk not in found],
+        })
    
 
-class NotificationView(ModelViewSet):
+class NotificationView(LazySchemaMixin, ModelViewSet):
     queryset = Notification.objects.all()
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user).order_by('-created_at')
+        return Notification.objects.filter(user=self.request.user).select_related('user').order_by('-created_at')
 
     # @action(detail=True, methods=['patch'])
     # def mark_as_read(self, request, pk=None):
@@ -1,9 +1,11 @@
 from django.shortcuts import render
 from api.models import Product, Category
-import requests
 from http import HTTPStatus
 # Create your views here.
 def home(request):
+    # Only this view makes outbound calls, so workers don't pay for importing requests at startup
+    import requests
+
     try:
         # fetch data from api
         api_base_url = "http://localhost:8000/api/v1"
@@ -14,7 +14,8 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 load_dotenv()
-from datetime import timedelta
+from datetime import datetime, timedelta, timezone
+from django.core.exceptions import ImproperlyConfigured
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -52,10 +53,16 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
+    # Removes itself unless QUERYLOG_ENABLED
+    'api.middleware.QueryLogMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # Needs request.user, removes itself unless PROFILING_ENABLED
+    'api.middleware.ProfilingMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -83,12 +90,103 @@ WSGI_APPLICATION = 'project.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
+# SQLite is used unless DB_ENGINE=postgres (or postgresql), the DB_* variables below configure PostgreSQL
+DB_ENGINES = {'sqlite': 'sqlite', 'sqlite3': 'sqlite', 'postgres': 'postgres', 'postgresql': 'postgres'}
+DB_ENGINE = DB_ENGINES.get(os.getenv('DB_ENGINE', 'sqlite').lower())
+if DB_ENGINE is None:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {os.getenv('DB_ENGINE')!r}, use one of {', '.join(DB_ENGINES)}")
+
+# WAL lets readers run while a write is in progress, IMMEDIATE transactions take the
+# write lock up front instead of failing with "database is locked" on upgrade
+SQLITE_OPTIONS = {
+    'init_command': (
+        'PRAGMA journal_mode=WAL;'
+        'PRAGMA synchronous=NORMAL;'
+        'PRAGMA temp_store=MEMORY;'
+        'PRAGMA cache_size=-20000;'
+    ),
+    'transaction_mode': 'IMMEDIATE',
+    'timeout': 5,
+}
+
+
+def sqlite_database(name):
+    return {
         'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',  # Creates db.sqlite3 in your project root
+        'NAME': BASE_DIR / name,
+        'OPTIONS': dict(SQLITE_OPTIONS),
+    }
+
+
+def postgres_database(prefix='DB'):
+    """PostgreSQL settings from {prefix}_NAME/USER/PASSWORD/HOST/PORT, falling back to DB_*"""
+    def env(key, default=None):
+        return os.getenv(f'{prefix}_{key}', os.getenv(f'DB_{key}', default))
+
+    database = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env('NAME', 'kinmel'),
+        'USER': env('USER', ''),
+        'PASSWORD': env('PASSWORD', ''),
+        'HOST': env('HOST', 'localhost'),
+        'PORT': env('PORT', '5432'),
+        # Keep connections open between requests instead of reconnecting every time
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        # Drop broken persistent connections before a request uses them
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            # Stop runaway queries from holding a connection forever
+            'options': f"-c statement_timeout={os.getenv('DB_STATEMENT_TIMEOUT_MS', 30000)}",
+        },
+    }
+    if os.getenv('DB_POOL'):
+        # Django's psycopg 3 pool, which can't be combined with persistent connections
+        database['CONN_MAX_AGE'] = 0
+        database['OPTIONS']['pool'] = {
+            'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+            'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+            'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        }
+    return database
+
+
+if DB_ENGINE == 'postgres':
+    DATABASES = {'default': postgres_database()}
+else:
+    DATABASES = {'default': sqlite_database('db.sqlite3')}  # Creates db.sqlite3 in your project root
+
+# Optional read replica, reads from safe requests are routed to it by api.db_routers
+# Locally a second SQLite file can stand in for it, filled with `python manage.py sync_replica`
+if DB_ENGINE == 'postgres' and os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = postgres_database('DB_REPLICA')
+elif DB_ENGINE != 'postgres' and os.getenv('DB_REPLICA_NAME'):
+    DATABASES['replica'] = sqlite_database(os.getenv('DB_REPLICA_NAME'))
+
+if 'replica' in DATABASES:
+    # Tests read the replica through the primary connection
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+# After a write the client keeps reading from the primary for this many seconds
+REPLICA_PIN_SECONDS = int(os.getenv('REPLICA_PIN_SECONDS', 5))
+
+
+# Cache
+# Per process memory by default, set REDIS_URL to share it between workers
+
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
     }
-}
 
 
 # Password validation
@@ -148,16 +246,33 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     
+    # orjson backed JSON, same output as DRF's JSONRenderer/JSONParser
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+
+    # Token bucket per role and endpoint, see THROTTLE_* below
+    'DEFAULT_THROTTLE_CLASSES': [
+        'api.throttling.RoleRateThrottle',
+    ],
     
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+        'rest_framework.filters.SearchFilter',
+        'rest_framework.filters.OrderingFilter',
+    ],
+
     # # Optional: Keep these if you want
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 10,
-    # 'DEFAULT_FILTER_BACKENDS': [
-    #     'django_filters.rest_framework.DjangoFilterBackend',
-    #     'rest_framework.filters.SearchFilter',
-    #     'rest_framework.filters.OrderingFilter',
-    # ],
 }
 
 # email notification
@@ -179,3 +294,150 @@ SPECTACULAR_SETTINGS = {
     'SERVE_PERMISSIONS': ['rest_framework.permissions.AllowAny'],
     
 }
+
+# Order archiving (python manage.py archive_orders)
+# delivered/cancelled orders older than this are moved to the archive tables
+ORDER_ARCHIVE_AFTER_DAYS = int(os.getenv('ORDER_ARCHIVE_AFTER_DAYS', 180))
+ORDER_ARCHIVE_BATCH_SIZE = int(os.getenv('ORDER_ARCHIVE_BATCH_SIZE', 500))
+
+# Delivery dispatch (python manage.py dispatch_deliveries)
+DISPATCH_BATCH_SIZE = int(os.getenv('DISPATCH_BATCH_SIZE', 200))
+# Couriers with this many open deliveries get no new ones, unset for no limit
+DISPATCH_MAX_OPEN_PER_COURIER = int(os.getenv('DISPATCH_MAX_OPEN_PER_COURIER')) if os.getenv('DISPATCH_MAX_OPEN_PER_COURIER') else None
+
+# Idempotency-Key support for checkout/add-to-cart (api/idempotency.py)
+# Stored responses are replayed for this long, purge with `python manage.py purge_idempotency_keys`
+IDEMPOTENCY_KEY_TTL = int(os.getenv('IDEMPOTENCY_KEY_TTL', 60 * 60 * 24))
+# How long a duplicate waits for the first request to finish before giving up with 409
+IDEMPOTENCY_WAIT_SECONDS = int(os.getenv('IDEMPOTENCY_WAIT_SECONDS', 10))
+# A request still unfinished after this long is taken for dead, a retry with its key runs again
+IDEMPOTENCY_INFLIGHT_TIMEOUT = int(os.getenv('IDEMPOTENCY_INFLIGHT_TIMEOUT', 60))
+
+# Single-flight caching of product/category reads (api/singleflight.py)
+SINGLEFLIGHT_ENABLED = os.getenv('SINGLEFLIGHT_ENABLED', '1') == '1'
+# Seconds a cached response is fresh
+SINGLEFLIGHT_TTL = int(os.getenv('SINGLEFLIGHT_TTL', 5))
+# Seconds a stale response keeps being served while one request refreshes it
+SINGLEFLIGHT_STALE_TTL = int(os.getenv('SINGLEFLIGHT_STALE_TTL', 30))
+SINGLEFLIGHT_LOCK_TIMEOUT = int(os.getenv('SINGLEFLIGHT_LOCK_TIMEOUT', 5))
+
+# API rate limits (api/throttling.py), None means unlimited
+THROTTLE_ROLE_RATES = {
+    'anon': '120/min',
+    'customer': '600/min',
+    'seller': '600/min',
+    'delivery': '600/min',
+    'admin': None,
+}
+# Extra limits for single endpoints ('<basename>.<action>'), a rate or a dict of rates per role
+THROTTLE_ENDPOINT_RATES = {
+    'product.list': {'anon': '60/min', 'customer': '120/min'},
+    'cart.add_to_cart': '60/min',
+    'cart.checkout': '10/min',
+}
+# Buckets live in process memory unless this names a cache from CACHES to share them
+THROTTLE_CACHE = os.getenv('THROTTLE_CACHE')
+THROTTLE_LOCAL_MAX_KEYS = 100000
+
+# Response compression (api.middleware.CompressionMiddleware)
+# brotli when the client accepts it and the package is installed, gzip otherwise
+COMPRESSION_MIN_SIZE = int(os.getenv('COMPRESSION_MIN_SIZE', 1024))
+BROTLI_QUALITY = int(os.getenv('BROTLI_QUALITY', 5))
+
+# OpenAPI schema cache (api/schema.py), written by `python manage.py generate_schema`
+SCHEMA_CACHE_DIR = BASE_DIR / '.schema_cache'
+# The schema is regenerated when this changes, a hash of the source files is used when unset
+CODE_VERSION = os.getenv('CODE_VERSION')
+
+# Lower edges of the price histogram buckets on /api/product/facets/, the last one is open ended
+PRODUCT_PRICE_BUCKETS = [0, 10, 25, 50, 100, 250, 500, 1000]
+
+# Product autocomplete (api/autocomplete.py), an in-memory prefix index per process
+# Build the index while the server boots (wsgi/asgi) rather than on the first search
+AUTOCOMPLETE_PRELOAD = os.getenv('AUTOCOMPLETE_PRELOAD', '1') == '1'
+# Rebuilt this often to catch changes made by other processes or bulk updates
+AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', 600))
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 50
+# Prefixes matching more entries than this have their results cached
+AUTOCOMPLETE_SCAN_LIMIT = 2000
+
+# "Frequently bought together" (python manage.py compute_recommendations)
+RECOMMENDATION_TOP_N = 10
+# Order items read per chunk, memory use grows with this and the number of distinct product pairs
+RECOMMENDATION_CHUNK_SIZE = int(os.getenv('RECOMMENDATION_CHUNK_SIZE', 100000))
+# Orders with more distinct products than this are skipped
+RECOMMENDATION_MAX_ORDER_SIZE = 50
+# Products recomputed together by an incremental run
+RECOMMENDATION_INCREMENTAL_BATCH = 500
+
+# Trending score (api/popularity.py), sales lose half their weight every TRENDING_HALF_LIFE_DAYS
+TRENDING_HALF_LIFE_DAYS = float(os.getenv('TRENDING_HALF_LIFE_DAYS', 7))
+# Fixed reference point for the decay, scores double every half-life after it and a float
+# holds about 1000 doublings. Moving it means running `python manage.py rebuild_popularity`
+TRENDING_EPOCH = datetime(2025, 1, 1, tzinfo=timezone.utc)
+
+# Abandoned carts (python manage.py expire_carts)
+# carts not updated for this long are deleted, a summary of each is kept in AbandonedCart
+CART_EXPIRE_AFTER_DAYS = int(os.getenv('CART_EXPIRE_AFTER_DAYS', 30))
+CART_EXPIRE_BATCH_SIZE = int(os.getenv('CART_EXPIRE_BATCH_SIZE', 1000))
+
+# Django admin changelists count at most this many rows (see api/admin.py)
+ADMIN_COUNT_LIMIT = 10000
+
+# How checkout picks between sellers stocking the same product (api/offers.py):
+# 'price' (cheapest), 'stock' (fewest sellers per item) or 'verified' (verified sellers first)
+OFFER_POLICY = os.getenv('OFFER_POLICY', 'price')
+
+# Inventory movement ledger (api/ledger.py), every stock change is logged so past stock
+# levels can be answered. `python manage.py snapshot_inventory` should run periodically
+# (e.g. hourly), a point-in-time lookup reads at most one period of the ledger
+INVENTORY_LEDGER_ENABLED = os.getenv('INVENTORY_LEDGER_ENABLED', '1') == '1'
+# Movements younger than this may belong to uncommitted transactions, snapshots leave them
+INVENTORY_SNAPSHOT_LAG_SECONDS = 60
+
+# Request profiler (api.middleware.ProfilingMiddleware), not even installed unless enabled.
+# Profiles are listed at /admin/profiles/ for superusers
+PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', '0') == '1'
+# Share of requests profiled at random, e.g. 0.01
+PROFILING_SAMPLE_RATE = float(os.getenv('PROFILING_SAMPLE_RATE', 0))
+# Requests with this header are profiled when it holds PROFILING_TOKEN or comes from a superuser
+PROFILING_HEADER = 'X-Profile'
+PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+# View paths or URL names to profile, e.g. "api.views.CartView,product-list", empty means all
+PROFILING_VIEWS = [view for view in os.getenv('PROFILING_VIEWS', '').split(',') if view]
+# 'cprofile' writes pstats files, 'sample' samples the stack every PROFILING_SAMPLE_INTERVAL_MS
+# into collapsed stacks for flamegraphs, with less overhead on the profiled request
+PROFILING_MODE = os.getenv('PROFILING_MODE', 'cprofile')
+PROFILING_SAMPLE_INTERVAL_MS = float(os.getenv('PROFILING_SAMPLE_INTERVAL_MS', 1))
+PROFILING_DIR = BASE_DIR / '.profiles'
+# Older profiles are deleted
+PROFILING_KEEP = 200
+
+# Per-request query log (api.middleware.QueryLogMiddleware, api/querylog.py), requests with
+# slow or repeated queries are logged as JSON warnings to the api.querylog logger.
+# Not even installed unless enabled, it times and keeps every query of a request
+QUERYLOG_ENABLED = os.getenv('QUERYLOG_ENABLED', '0') == '1'
+QUERYLOG_SLOW_MS = float(os.getenv('QUERYLOG_SLOW_MS', 100))
+# The same query this many times in one request is reported as a likely N+1
+QUERYLOG_DUPLICATE_THRESHOLD = int(os.getenv('QUERYLOG_DUPLICATE_THRESHOLD', 3))
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        # The message already is a JSON document
+        'message': {'format': '{message}', 'style': '{'},
+    },
+    'handlers': {
+        'querylog': {'class': 'logging.StreamHandler', 'formatter': 'message'},
+    },
+    'loggers': {
+        'api.querylog': {
+            'handlers': ['querylog'],
+            # DEBUG logs every request, not just the flagged ones
+            'level': os.getenv('QUERYLOG_LEVEL', 'WARNING'),
+            'propagate': False,
+        },
+    },
+}
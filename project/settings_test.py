@@ -0,0 +1,53 @@
+"""
+Settings for the test suite, `python manage.py test` picks them up by default.
+Everything runs against an in-memory SQLite database with a fast password hasher,
+so `python manage.py test --parallel` gives every worker its own copy of it.
+"""
+
+import os
+import tempfile
+from pathlib import Path
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, SECRET_KEY, THROTTLE_ROLE_RATES
+
+SECRET_KEY = SECRET_KEY or 'insecure-test-only-secret-key'
+
+# A fresh in-memory database per run (and per --parallel worker), no replica
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.sqlite3',
+        'TEST': {'NAME': ':memory:'},
+    }
+}
+
+# Hashing test passwords with PBKDF2 would dominate the run time
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+# Token buckets outlive the rolled back test that filled them, tests of the limits
+# set their own rates with override_settings
+THROTTLE_ROLE_RATES = {role: None for role in THROTTLE_ROLE_RATES}
+THROTTLE_ENDPOINT_RATES = {}
+THROTTLE_CACHE = None
+
+# No background index build or per-request instrumentation
+AUTOCOMPLETE_PRELOAD = False
+PROFILING_ENABLED = False
+QUERYLOG_ENABLED = False
+
+# Files written by tests stay out of the checkout, one folder per run
+TEST_FILES_DIR = Path(tempfile.gettempdir()) / f'kinmel-test-{os.getpid()}'
+SCHEMA_CACHE_DIR = TEST_FILES_DIR / 'schema_cache'
+PROFILING_DIR = TEST_FILES_DIR / 'profiles'
+
+# Latency budgets of the performance tests (api/tests/test_performance.py) are multiplied
+# by this, raise it on slow CI machines
+PERFORMANCE_BUDGET_FACTOR = float(os.getenv('PERFORMANCE_BUDGET_FACTOR', 1))
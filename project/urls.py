@@ -17,20 +17,24 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 # from rest_framework.authtoken.views import obtain_auth_token
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from api.admin import profile_detail, profile_index
+from api.lazy import lazy_view
 
 
 
 urlpatterns = [
 
     # API views
+    path('admin/profiles/', admin.site.admin_view(profile_index), name='admin-profiles'),
+    path('admin/profiles/<str:name>/', admin.site.admin_view(profile_detail), name='admin-profile'),
     path('admin/', admin.site.urls),
     path('api/', include('api.urls')),
 
     # path('api/v1/token/', obtain_auth_token, name='api_token_auth'),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
-    path('api/docs/swagger/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
-    path('api/docs/redoc/', SpectacularRedocView.as_view(url_name='schema'), name='redoc'),
+    # drf_spectacular is only imported once the docs are first opened
+    path('api/schema/', lazy_view('api.schema.CachedSchemaView'), name='schema'),
+    path('api/docs/swagger/', lazy_view('drf_spectacular.views.SpectacularSwaggerView', url_name='schema'), name='swagger-ui'),
+    path('api/docs/redoc/', lazy_view('drf_spectacular.views.SpectacularRedocView', url_name='schema'), name='redoc'),
     
     # Frontend views
     path('', include('frontend.urls')),